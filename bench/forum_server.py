@@ -0,0 +1,248 @@
+"""Локальный сервер-заглушка форума в стиле XenForo для бенчмарков.
+
+Отдает синтетические страницы с теми же селекторами, что использует Parser:
+списки тем (structItem-title, pageNav-main, pageNav-jump--next), темы с несколькими страницами
+(js-replyNewMessageContainer, ul.attachmentList, кнопка «Скачать»), страницы загрузок (.block-row)
+и бинарные вложения заданного размера с задержкой, ETag, HEAD и Range. Разделов может быть несколько;
+часть вложений общая для всех тем и разделов.
+
+Запуск отдельно:
+    python forum_server.py --threads 200 --port 8800
+"""
+import argparse
+import hashlib
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class ForumConfig:
+    threads: int = 100  # всего тем в разделе
+    sections: int = 1  # разделов форума /forums/bench.1 ... /forums/bench.N
+    threads_per_page: int = 20  # тем на странице списка
+    thread_pages: int = 2  # страниц в каждой теме
+    posts_per_page: int = 10  # сообщений на странице темы
+    post_size: int = 400  # символов текста в сообщении
+    attachment_size: int = 256 * 1024  # байт во вложении
+    shared_attachments: int = 5  # вложений, общих для многих тем (дубликаты)
+    hub_every: int = 10  # каждая N-я тема ссылается на страницу загрузок
+    broken_every: int = 0  # каждая N-я тема ссылается на вложение, которого нет на сервере (404)
+    latency: float = 0.0  # секунд задержки каждого ответа
+    page_padding: int = 20000  # символов «шума» на каждой странице, как у настоящего форума
+
+    @property
+    def listing_pages(self):
+        return max(1, -(-self.threads // self.threads_per_page))
+
+
+class ForumState:
+    """Генератор страниц и счетчики запросов."""
+
+    def __init__(self, config):
+        self.config = config
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.padding = "<div class='p-nav'>" + ("x" * config.page_padding) + "</div>"
+        self.replies = {}  # ID темы -> ответов, добавленных после запуска (add_reply)
+        self.failing = {}  # (метод, путь) -> сколько еще раз ответить на него 404 (fail)
+
+    def count(self, size):
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += size
+
+    def fail(self, path, times=1, method=None):
+        """Следующие times запросов по пути path получат 404, как при сбое сайта.
+
+        method — "GET" или "HEAD", чтобы сбоили только такие запросы (None — любые).
+        """
+        with self.lock:
+            self.failing[(method, path)] = times
+
+    def should_fail(self, method, path):
+        with self.lock:
+            for key in ((method, path), (None, path)):
+                if self.failing.get(key, 0) > 0:
+                    self.failing[key] -= 1
+                    return True
+            return False
+
+    def add_reply(self, thread_id):
+        """Добавляет в тему ответ с новым вложением на ее последней странице."""
+        with self.lock:
+            self.replies[thread_id] = self.replies.get(thread_id, 0) + 1
+
+    def listing_page(self, number, section=1):
+        config = self.config
+        first = (number - 1) * config.threads_per_page
+        offset = (section - 1) * config.threads  # ID тем разных разделов не пересекаются
+        items = "".join(
+            f'<div class="structItem"><div class="structItem-title">'
+            f'<a href="/threads/thread-{i}.{i}/unread">Тема {i}</a></div>'
+            f'<div class="structItem-cell structItem-cell--meta"><dl class="pairs"><dt>Ответы</dt>'
+            f'<dd>{config.thread_pages * config.posts_per_page + self.replies.get(i, 0)}</dd></dl></div>'
+            f'<div class="structItem-cell structItem-cell--latest">'
+            f'<time class="structItem-latestDate" data-time="{1700000000 + self.replies.get(i, 0)}">дата</time>'
+            f'</div></div>'
+            for i in range(offset + first, offset + min(first + config.threads_per_page, config.threads))
+        )
+        return self.page(number, config.listing_pages, f"/forums/bench.{section}", items, "")
+
+    def thread_page(self, thread_id, number):
+        config = self.config
+        posts = "".join(
+            f'<article class="message"><a class="username">user{(thread_id + j) % 50}</a>'
+            f'<div class="bbWrapper">{self.post_text(thread_id, number, j)}</div></article>'
+            for j in range(config.posts_per_page)
+        )
+        attachments = [f"/attachments/own-{thread_id}-{number}.{thread_id}/"]
+        if number == config.thread_pages:
+            for k in range(1, self.replies.get(thread_id, 0) + 1):
+                posts += (f'<article class="message"><a class="username">replier</a>'
+                          f'<div class="bbWrapper">Ответ {k} в теме {thread_id}</div></article>')
+                attachments.append(f"/attachments/reply-{thread_id}-{k}.{thread_id}/")
+        if number == 1 and config.broken_every and thread_id % config.broken_every == 0:
+            attachments.append(f"/attachments/missing-{thread_id}.{thread_id}/")
+        if number == 1 and config.shared_attachments:
+            attachments.append(f"/attachments/shared-{thread_id % config.shared_attachments}.0/")
+        attachment_list = "".join(
+            f'<li><a href="{url}" title="{url.split("/")[2].split(".")[0]}.bin">файл</a></li>' for url in attachments
+        )
+        download_button = ""
+        if number == 1 and config.hub_every and thread_id % config.hub_every == 0:
+            download_button = '<div class="p-title-pageAction"><a class="button--cta" href="/resources/hub.1/download">Скачать</a></div>'
+
+        head = (f'<div class="p-title"><h1 class="p-title-value">Тема {thread_id}</h1></div>{download_button}')
+        body = (f'<div class="block-body js-replyNewMessageContainer">{posts}</div>'
+                f'<ul class="attachmentList">{attachment_list}</ul>')
+        return self.page(number, config.thread_pages, f"/threads/thread-{thread_id}.{thread_id}", body, head)
+
+    def post_text(self, thread_id, page, post):
+        seed = f"Сообщение {post} на странице {page} темы {thread_id}. "
+        return (seed * (self.config.post_size // len(seed) + 1))[: self.config.post_size]
+
+    def page(self, number, total, base_path, body, head):
+        nav = "".join(f'<li><a href="{base_path}/page-{k}">{k}</a></li>' for k in range(1, total + 1))
+        next_link = f'<a class="pageNav-jump--next" href="{base_path}/page-{number + 1}">Вперед</a>' if number < total else ""
+        return (f"<html><head><title>bench</title></head><body>{self.padding}{head}"
+                f'<ul class="pageNav-main">{nav}</ul>{body}{next_link}{self.padding}</body></html>')
+
+    @staticmethod
+    def hub_page():
+        rows = "".join(
+            f'<div class="block-row"><div class="contentRow-title">hub-{i}.bin</div>'
+            f'<div class="contentRow-extra"><a href="/attachments/hub-{i}.0/">Скачать</a></div></div>'
+            for i in range(2)
+        )
+        return f'<html><body><div class="block"><div class="block-body">{rows}</div></div></body></html>'
+
+    def attachment(self, name):
+        block = hashlib.sha256(name.encode()).digest()
+        size = self.config.attachment_size
+        return (block * (size // len(block) + 1))[:size]
+
+
+class ForumHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # ForumState, задается в start_server
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.route(head=True)
+
+    def do_GET(self):
+        self.route(head=False)
+
+    def route(self, head):
+        state = self.state
+        if state.config.latency:
+            time.sleep(state.config.latency)
+
+        path = self.path
+        if state.should_fail("HEAD" if head else "GET", path):
+            return self.send_bytes(404, b"not found", "text/plain", {}, head)
+        match = re.fullmatch(r"/forums/bench\.(\d+)/?(?:page-(\d+))?", path)
+        if match and 1 <= int(match[1]) <= state.config.sections:
+            return self.send_html(state.listing_page(int(match[2] or 1), int(match[1])), head)
+        if match := re.fullmatch(r"/threads/thread-(\d+)\.\d+/?(?:page-(\d+))?", path):
+            return self.send_html(state.thread_page(int(match[1]), int(match[2] or 1)), head)
+        if path.startswith("/resources/hub.1/download"):
+            return self.send_html(state.hub_page(), head)
+        if (match := re.fullmatch(r"/attachments/([\w-]+)\.\d+/", path)) and not match[1].startswith("missing"):
+            return self.send_file(match[1], state.attachment(match[1]), head)
+        self.send_bytes(404, b"not found", "text/plain", {}, head)
+
+    def send_html(self, html, head):
+        body = html.encode("utf-8")
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self.send_bytes(304, b"", "text/html; charset=utf-8", {"ETag": etag}, head)
+        self.send_bytes(200, body, "text/html; charset=utf-8", {"ETag": etag}, head)
+
+    def send_file(self, name, body, head):
+        headers = {"Content-Disposition": f'attachment; filename="{name}.bin"', "Accept-Ranges": "bytes"}
+        if range_header := self.headers.get("Range"):
+            start = int(range_header.split("=")[1].split("-")[0])
+            if start >= len(body):
+                return self.send_bytes(416, b"", "text/plain", {"Content-Range": f"bytes */{len(body)}"}, head)
+            headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            return self.send_bytes(206, body[start:], "application/octet-stream", headers, head)
+        self.send_bytes(200, body, "application/octet-stream", headers, head)
+
+    def send_bytes(self, status, body, content_type, headers, head):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+        self.state.count(0 if head else len(body))
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # Клиент может закрыть соединение раньше времени — для бенчмарка это не ошибка
+
+
+def start_server(config, port=0):
+    """Запускает сервер в фоновом потоке; возвращает (сервер, состояние, URL раздела форума)."""
+    state = ForumState(config)
+    handler = type("BoundForumHandler", (ForumHandler,), {"state": state})
+    server = QuietServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    return server, state, base_url
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Локальный сервер-заглушка форума для бенчмарков.")
+    arg_parser.add_argument("--threads", type=int, default=ForumConfig.threads)
+    arg_parser.add_argument("--sections", type=int, default=ForumConfig.sections)
+    arg_parser.add_argument("--attachment-size", type=int, default=ForumConfig.attachment_size)
+    arg_parser.add_argument("--latency", type=float, default=ForumConfig.latency)
+    arg_parser.add_argument("--port", type=int, default=8800)
+    args = arg_parser.parse_args()
+
+    config = ForumConfig(threads=args.threads, sections=args.sections, attachment_size=args.attachment_size,
+                         latency=args.latency)
+    server, _, base_url = start_server(config, args.port)
+    for section in range(1, config.sections + 1):
+        print(f"Раздел форума доступен по адресу {base_url}/forums/bench.{section}/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Офлайн-бенчмарки парсера на локальном сервере-заглушке форума.
+
+Замеряет полный обход parse_forum на форумах разного размера (темы/с, МБ/с), функции извлечения
+данных из HTML, пиковую память разбора огромной страницы темы и путь обновления отчета. Результаты печатаются и записываются в JSON,
+чтобы сравнивать прогоны между собой и ловить просадки производительности.
+
+Запуск:
+    python bench/run_benchmarks.py
+    python bench/run_benchmarks.py --sizes 50 200 --workers 1 4 --output bench/results/base.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from forum_server import ForumConfig, ForumState, start_server  # noqa: E402
+from html_page import HTML_BACKEND, HtmlPage, PAGE_STRAINER  # noqa: E402
+from http_session import create_session  # noqa: E402
+from parser import Parser  # noqa: E402
+from crawl_db import CrawlDatabase  # noqa: E402
+from report import ReportStore  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_SIZES = (20, 100, 300)
+DEFAULT_WORKERS = (1, 4)
+
+
+def best_of(repeat, func):
+    """Запускает func repeat раз и возвращает лучшее время в секундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_crawl(threads, workers, config_overrides):
+    """Полный обход раздела из threads тем: список, темы, вложения, страницы загрузок и отчет."""
+    config = ForumConfig(threads=threads, **config_overrides)
+    server, state, base_url = start_server(config)
+    save_path = tempfile.mkdtemp(prefix="bench_crawl_")
+    try:
+        parser = Parser(create_session(rate=0), f"{base_url}/forums/bench.1/", save_path=save_path,
+                        workers=workers, use_cache=False, base_url=base_url)
+        start = time.perf_counter()
+        # Построчный вывод парсера в консоль искажал бы замер, поэтому он отбрасывается
+        with contextlib.redirect_stdout(io.StringIO()):
+            threads_done = sum(1 for _ in parser.parse_forum())
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(save_path, ignore_errors=True)
+
+    megabytes = parser.stats["bytes_downloaded"] / 2 ** 20
+    return {
+        "threads": threads,
+        "workers": workers,
+        "threads_done": threads_done,
+        "seconds": round(elapsed, 4),
+        "threads_per_second": round(threads_done / elapsed, 2),
+        "downloaded_mb": round(megabytes, 2),
+        "mb_per_second": round(megabytes / elapsed, 2),
+        "requests": state.requests,
+    }
+
+
+def bench_extraction(repeat):
+    """Разбор HTML и извлечение ссылок на темы, сообщений и вложений без сети."""
+    state = ForumState(ForumConfig(threads=20, posts_per_page=20))
+    listing_html = state.listing_page(1)
+    thread_html = state.thread_page(1, 1)
+    parser = Parser(None, "http://bench.invalid/forums/bench.1/", save_path=tempfile.mkdtemp(prefix="bench_html_"),
+                    base_url="http://bench.invalid")
+    try:
+        listing = HtmlPage(listing_html)
+        thread = HtmlPage(thread_html)
+
+        results = {
+            "parse_listing_ms": best_of(repeat, lambda: HtmlPage(listing_html)),
+            "parse_thread_ms": best_of(repeat, lambda: HtmlPage(thread_html)),
+            "parse_thread_parts_ms": best_of(repeat, lambda: HtmlPage(thread_html, parse_only=PAGE_STRAINER)),
+            "find_thread_links_ms": best_of(repeat, lambda: parser.find_thread_links(listing)),
+            "find_next_page_url_ms": best_of(repeat, lambda: parser.find_next_page_url(listing)),
+            "extract_articles_ms": best_of(repeat, lambda: parser.extract_articles(thread)),
+            "attachment_links_ms": best_of(repeat, lambda: thread.select("ul.attachmentList a[href]")),
+        }
+    finally:
+        shutil.rmtree(parser.save_path, ignore_errors=True)
+    results = {name: round(seconds * 1000, 3) for name, seconds in results.items()}
+    results["page_kb"] = round(len(thread_html.encode("utf-8")) / 1024, 1)
+    return results
+
+
+def bench_page_memory(posts):
+    """Пиковая память разбора одной страницы темы из posts сообщений: целиком и только нужные фрагменты."""
+    state = ForumState(ForumConfig(threads=1, posts_per_page=posts, page_padding=256 * 1024))
+    thread_html = state.thread_page(1, 1)
+    parser = Parser(None, "http://bench.invalid/forums/bench.1/", save_path=tempfile.mkdtemp(prefix="bench_memory_"),
+                    base_url="http://bench.invalid")
+
+    def peak(parse_only):
+        tracemalloc.start()
+        try:
+            page = HtmlPage(thread_html, parse_only=parse_only)
+            articles = len(parser.extract_thread_page(page)[0])
+            return tracemalloc.get_traced_memory()[1], articles
+        finally:
+            tracemalloc.stop()
+
+    try:
+        full_peak, full_articles = peak(None)
+        parts_peak, parts_articles = peak(PAGE_STRAINER)
+    finally:
+        shutil.rmtree(parser.save_path, ignore_errors=True)
+
+    assert full_articles == parts_articles == posts, "Целевой разбор потерял сообщения"
+    return {
+        "posts": posts,
+        "page_mb": round(len(thread_html.encode("utf-8")) / 2 ** 20, 2),
+        "full_peak_mb": round(full_peak / 2 ** 20, 2),
+        "parts_peak_mb": round(parts_peak / 2 ** 20, 2),
+    }
+
+
+def bench_report(rows):
+    """Добавление строк в базу отчета, проверка дубликатов и выгрузка report.xlsx."""
+    directory = tempfile.mkdtemp(prefix="bench_report_")
+    try:
+        database = CrawlDatabase(os.path.join(directory, "crawl_state.db"), "http://bench.invalid/")
+        store = ReportStore(os.path.join(directory, "report.xlsx"), database, export_interval=None)
+        urls = [f"http://bench.invalid/attachments/file-{i}.{i}/" for i in range(rows)]
+
+        start = time.perf_counter()
+        for i, url in enumerate(urls):
+            store.add_row("Скачан", f"Тема {i // 5}", f"http://bench.invalid/threads/{i // 5}", url, f"file-{i}.bin")
+        add_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for url in urls:
+            store.has_file(url)
+        lookup_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store.export()
+        export_seconds = time.perf_counter() - start
+
+        # Перенос отчета прежних версий в новую базу
+        start = time.perf_counter()
+        ReportStore(store.excel_path, CrawlDatabase(os.path.join(directory, "imported.db")))
+        import_seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "rows": rows,
+        "add_row_us": round(add_seconds / rows * 10 ** 6, 2),
+        "has_file_us": round(lookup_seconds / rows * 10 ** 6, 3),
+        "export_seconds": round(export_seconds, 4),
+        "import_seconds": round(import_seconds, 4),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Офлайн-бенчмарки парсера.")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Размеры форума (тем)")
+    arg_parser.add_argument("--workers", type=int, nargs="+", default=DEFAULT_WORKERS,
+                            help="Количество потоков для полного обхода")
+    arg_parser.add_argument("--attachment-size", type=int, default=ForumConfig.attachment_size,
+                            help="Размер вложения в байтах")
+    arg_parser.add_argument("--latency", type=float, default=ForumConfig.latency,
+                            help="Задержка каждого ответа сервера в секундах")
+    arg_parser.add_argument("--page-posts", type=int, default=2000,
+                            help="Сообщений на странице темы в бенчмарке памяти")
+    arg_parser.add_argument("--report-rows", type=int, default=5000, help="Строк в бенчмарке отчета")
+    arg_parser.add_argument("--repeat", type=int, default=20, help="Повторов микробенчмарков")
+    arg_parser.add_argument("--output", help="JSON-файл с результатами (по умолчанию bench/results/<время>.json)")
+    args = arg_parser.parse_args()
+
+    config_overrides = {"attachment_size": args.attachment_size, "latency": args.latency}
+    results = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "html_backend": HTML_BACKEND,
+        "config": vars(args),
+        "crawl": [],
+    }
+
+    for threads in args.sizes:
+        for workers in args.workers:
+            result = bench_crawl(threads, workers, config_overrides)
+            results["crawl"].append(result)
+            print(f"🚀 Обход: {threads} тем, {workers} потоков — {result['seconds']} с, "
+                  f"{result['threads_per_second']} тем/с, {result['mb_per_second']} МБ/с")
+
+    results["extraction"] = bench_extraction(args.repeat)
+    print(f"🔍 Извлечение из HTML (мс): {results['extraction']}")
+
+    results["page_memory"] = bench_page_memory(args.page_posts)
+    print(f"🧠 Память разбора страницы: {results['page_memory']}")
+
+    results["report"] = bench_report(args.report_rows)
+    print(f"📊 Отчет: {results['report']}")
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"✅ Результаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+
+SITE_URL = "https://ecu-firmware-files.ru"
+LOGIN_URL = f"{SITE_URL}/login"
+LOGIN_POST_URL = f"{SITE_URL}/login/login"
+ACCOUNT_URL = f"{SITE_URL}/account/"
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+COOKIE_FILE = os.path.join(os.path.expanduser("~"), ".ecu_parser_cookies.json")
+
+
+class LoginError(Exception):
+    """Не удалось войти на сайт."""
+
+
+class SessionExpired(requests.RequestException):
+    """Сайт перенаправил на страницу входа, а войти заново нечем (нет пароля) или не удалось."""
+
+
+def save_cookies(session, path=COOKIE_FILE):
+    """Атомарно сохраняет cookies сессии в файл, доступный только владельцу."""
+    cookies = [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+                "expires": c.expires, "secure": c.secure} for c in session.cookies]
+    # Свой временный файл у каждого процесса и потока: разделы, вошедшие заново одновременно,
+    # не испортят записи друг друга
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+        json.dump(cookies, f)
+    os.replace(tmp_path, path)
+
+
+def load_cookies(session, path=COOKIE_FILE):
+    """Загружает сохраненные cookies в сессию. Возвращает False, если файла нет или он испорчен."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cookies = json.load(f)
+        for cookie in cookies:
+            session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"],
+                                expires=cookie.get("expires"), secure=cookie.get("secure", False))
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.error(f"❌ Не удалось прочитать сохраненную сессию {path}: {e}")
+        return False
+    return bool(cookies)
+
+
+def is_logged_in(session):
+    """Проверяет сессию одним запросом: страница аккаунта открывается только после входа."""
+    # Запрос в обход повторного входа: истекшая сессия здесь — ожидаемый ответ, а не повод входить заново
+    send = getattr(session, "send_limited", session.request)
+    try:
+        response = send("GET", ACCOUNT_URL, headers=HEADERS, allow_redirects=False)
+    except requests.RequestException as e:
+        logging.error(f"❌ Не удалось проверить сессию: {e}")
+        return False
+    response.close()
+    return response.status_code == 200
+
+
+def restore_session(session, path=COOKIE_FILE):
+    """Подставляет в сессию cookies прошлого входа, если они еще действительны."""
+    if not load_cookies(session, path):
+        return False
+    if is_logged_in(session):
+        logging.info("Сохраненная сессия действительна, повторный вход не нужен.")
+        if getattr(session, "keeper", None) is None:
+            session.keeper = SessionKeeper(cookie_path=path)
+        return True
+    logging.info("Сохраненная сессия истекла.")
+    session.cookies.clear()
+    return False
+
+
+def is_login_page(response):
+    """Ответ — перенаправление на страницу входа или отказ в доступе с формой входа."""
+    # Запросы к самой странице входа (в том числе при повторном входе) не проверяем
+    original = response.history[0] if response.history else response
+    if urlsplit(original.url).path.startswith("/login"):
+        return False
+
+    for step in list(response.history) + [response]:
+        if step.is_redirect and urlsplit(step.headers.get("Location", "")).path.startswith("/login"):
+            return True
+    if urlsplit(response.url).path.startswith("/login"):
+        return True
+    # XenForo отвечает 403 со встроенной формой входа на закрытые разделы
+    return (response.status_code in (401, 403) and "text/html" in response.headers.get("Content-Type", "")
+            and "/login/login" in response.text)
+
+
+class SessionKeeper:
+    """Повторный вход посреди обхода: RateLimitedSession вызывает его, когда сайт отправляет на страницу входа.
+
+    Одновременные запросы, наткнувшиеся на истекшую сессию, ждут один общий вход и затем повторяются.
+    """
+
+    def __init__(self, username=None, password=None, cookie_path=COOKIE_FILE):
+        self.username = username
+        self.password = password
+        self.cookie_path = cookie_path
+        self.lock = threading.Lock()
+        self.generation = 0  # Номер входа; растет после каждого успешного повторного входа
+        self.failed = None  # Ошибка неудачного повторного входа: больше не пытаемся, чтобы не долбить /login
+
+    def needs_login(self, response):
+        return is_login_page(response)
+
+    def check_replay(self, response):
+        """Повторенный после входа запрос снова попал на страницу входа — доступа нет."""
+        if self.needs_login(response):
+            response.close()
+            raise SessionExpired(f"После повторного входа сайт снова требует вход: {response.url}")
+
+    def reauthenticate(self, session, generation):
+        """Входит заново, если этого еще не сделал другой поток. Выбрасывает SessionExpired при неудаче."""
+        with self.lock:
+            if generation != self.generation:
+                return  # Пока запрос ждал блокировку, другой поток уже вошел заново
+            if self.failed:
+                raise SessionExpired(self.failed)
+            if not self.password:
+                self.failed = "Сессия истекла, войдите заново."
+                raise SessionExpired(self.failed)
+            logging.warning("⚠️ Сессия истекла посреди обхода, выполняем повторный вход...")
+            session.cookies.clear()
+            try:
+                login(session, self.username, self.password, self.cookie_path)
+            except (LoginError, requests.RequestException) as e:
+                self.failed = f"Повторный вход не удался: {e}"
+                raise SessionExpired(self.failed) from e
+            self.generation += 1
+
+
+def login(session, username, password, cookie_path=COOKIE_FILE):
+    """Выполняет вход на сайт в переданной сессии; при неудаче выбрасывает LoginError.
+
+    Cookies успешного входа сохраняются в cookie_path (None — не сохранять), а сессия запоминает
+    логин и пароль, чтобы войти заново, если сайт завершит сессию посреди обхода.
+    """
+    logging.info("Начинаем процесс входа...")
+
+    payload = {"login": username, "password": password, "remember": "1"}
+
+    response = session.get(LOGIN_URL, headers=HEADERS)
+    logging.info(f"Получен ответ от страницы входа: {response.status_code}")
+
+    if response.status_code != 200:
+        raise LoginError(f"Ошибка входа: {response.status_code}")
+
+    login_response = session.post(LOGIN_POST_URL, data=payload, headers=HEADERS)
+    logging.info(f"Ответ на вход: {login_response.status_code}")
+
+    if login_response.status_code == 200 and "/account/" in login_response.text:
+        logging.info("Вход выполнен успешно!")
+        if cookie_path:
+            try:
+                save_cookies(session, cookie_path)
+            except OSError as e:
+                logging.error(f"❌ Не удалось сохранить сессию {cookie_path}: {e}")
+        if (keeper := getattr(session, "keeper", None)) is None:
+            session.keeper = SessionKeeper(username, password, cookie_path)
+        else:
+            keeper.username, keeper.password = username, password
+            keeper.failed = None  # Вошли заново — повторный вход посреди обхода снова возможен
+        return session
+
+    raise LoginError("Ошибка входа. Проверьте логин и пароль.")
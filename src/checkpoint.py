@@ -0,0 +1,87 @@
+import json
+import logging
+import os
+
+CHECKPOINT_FILE_NAME = "crawl_state.json"  # Контрольная точка прежних версий, переносится в базу
+
+
+class Checkpoint:
+    """Состояние обхода форума: страница, с которой продолжать, и ID уже обработанных тем
+    с отметкой их последнего ответа (дата или число ответов из списка тем).
+
+    Хранится в базе состояния обхода (CrawlDatabase); каждое изменение сразу записывается транзакцией.
+    """
+
+    def __init__(self, database, main_url, legacy_path=None):
+        self.database = database
+        self.main_url = main_url
+
+        if legacy_path and os.path.exists(legacy_path) and not self.database.get_meta("checkpoint_imported"):
+            self.import_json(legacy_path)
+
+    def import_json(self, path):
+        """Переносит в базу контрольную точку crawl_state.json прежних версий (один раз)."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"❌ Не удалось прочитать контрольную точку {path}: {e}")
+            return
+
+        with self.database.transaction():
+            if state.get("main_url") == self.main_url:
+                for thread_id in state.get("thread_ids", []):
+                    self.database.add_thread(thread_id)
+                self.database.set_meta("checkpoint_main_url", self.main_url)
+                self.database.set_meta("next_page_url", state.get("next_page_url"))
+                self.database.set_meta("pages_done", state.get("pages_done", 0))
+            else:
+                logging.info(f"Контрольная точка {path} относится к другому форуму и не переносится.")
+            self.database.set_meta("checkpoint_imported", 1)
+
+    @property
+    def next_page_url(self):
+        """Следующая необработанная страница списка тем (None — обход завершен или относится к другому форуму)."""
+        if self.database.get_meta("checkpoint_main_url") != self.main_url:
+            return None
+        return self.database.get_meta("next_page_url")
+
+    @property
+    def pages_done(self):
+        if self.database.get_meta("checkpoint_main_url") != self.main_url:
+            return 0
+        return int(self.database.get_meta("pages_done", 0))
+
+    def has_thread(self, thread_id):
+        return self.database.has_thread(thread_id)
+
+    def thread_changed(self, thread_id, last_post):
+        """Нужно ли (снова) обработать тему: она новая или в ней появились ответы.
+
+        last_post — отметка последнего ответа из списка тем; если список ее не показывает (None),
+        известная тема считается неизменной. Темы, обработанные до появления отметок, обрабатываются
+        заново один раз.
+        """
+        known, stored = self.database.thread_last_post(thread_id)
+        if not known:
+            return True
+        return last_post is not None and stored != last_post
+
+    def add_thread(self, thread_id, thread_url=None, title=None, last_post=None):
+        if thread_id:
+            self.database.add_thread(thread_id, thread_url, title, last_post)
+
+    def restart(self):
+        """Начинает новый обход с первой страницы, сохраняя список обработанных тем."""
+        with self.database.transaction():
+            self.database.set_meta("checkpoint_main_url", self.main_url)
+            self.database.set_meta("pages_done", 0)
+            self.database.set_meta("next_page_url", None)
+
+    def page_done(self, next_page_url):
+        """Отмечает страницу списка тем как полностью обработанную."""
+        with self.database.transaction():
+            pages_done = self.pages_done
+            self.database.set_meta("checkpoint_main_url", self.main_url)
+            self.database.set_meta("pages_done", pages_done + 1)
+            self.database.set_meta("next_page_url", next_page_url)
@@ -0,0 +1,179 @@
+"""Запуск парсера без графического интерфейса (например, из cron).
+
+Пример:
+    python cli.py --login user --url https://ecu-firmware-files.ru/forums/... --save-path ./dumps
+    python cli.py --login user --report ./dumps/report.xlsx --incremental
+    python cli.py --report ./dumps/report.xlsx --export-report
+    python cli.py --login user --url URL1 --url URL2 --url URL3 --save-path ./dumps --processes 3
+
+Пароль берется из --password, переменной окружения ECU_PASSWORD или запрашивается в терминале.
+Cookies входа сохраняются (--cookies) и используются в следующих запусках, пока сессия действительна.
+"""
+import argparse
+import getpass
+import logging
+import os
+import re
+import sys
+from urllib.parse import urlsplit
+
+import auth
+from file_store import STORE_DIR_NAME
+from http_session import create_session
+
+
+def forum_folder_name(url):
+    """Имя подпапки для форума, когда за один запуск обходится несколько разделов."""
+    return re.sub(r"[^\w.-]+", "_", urlsplit(url).path.strip("/")) or "forum"
+
+
+def parse_args(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Парсер форума ecu-firmware-files.ru без графического интерфейса.")
+    arg_parser.add_argument("--login", help="логин на сайте")
+    arg_parser.add_argument("--password", help="пароль (по умолчанию — ECU_PASSWORD или запрос в терминале)")
+    arg_parser.add_argument("--cookies", default=auth.COOKIE_FILE,
+                            help=f"файл сохраненной сессии (по умолчанию {auth.COOKIE_FILE})")
+    arg_parser.add_argument("--url", action="append", default=[], dest="urls",
+                            help="URL раздела форума; можно указать несколько раз")
+    arg_parser.add_argument("--save-path", help="каталог для скачивания")
+    arg_parser.add_argument("--report", help="путь к report.xlsx прошлого запуска (URL и каталог берутся из него)")
+    arg_parser.add_argument("--workers", type=int, help="количество тем, обрабатываемых одновременно")
+    arg_parser.add_argument("--download-workers", type=int, help="количество файлов, скачиваемых одновременно")
+    arg_parser.add_argument("--max-bandwidth", type=float, help="общий лимит скорости скачивания файлов, МБ/с")
+    arg_parser.add_argument("--processes", type=int, default=1,
+                            help="количество процессов для параллельного обхода нескольких разделов")
+    arg_parser.add_argument("--incremental", action="store_true", help="обойти только новые темы")
+    arg_parser.add_argument("--no-cache", action="store_true", help="не использовать кэш HTML-страниц")
+    arg_parser.add_argument("--metrics-json", help="куда записать JSON-сводку метрик (по умолчанию в каталог форума)")
+    arg_parser.add_argument("--prometheus", help="файл для периодической выгрузки метрик в формате Prometheus")
+    arg_parser.add_argument("--measure-memory", action="store_true",
+                            help="замерять пиковую память разбора каждой страницы (медленнее, для диагностики)")
+    arg_parser.add_argument("--full-pages", action="store_true",
+                            help="разбирать HTML-страницы целиком, а не только нужные фрагменты")
+    arg_parser.add_argument("--export-report", action="store_true",
+                            help="только пересобрать report.xlsx из базы состояния обхода, без входа и обхода")
+    args = arg_parser.parse_args(argv)
+
+    if not args.urls and not args.report:
+        arg_parser.error("укажите --url или --report")
+    if args.report and len(args.urls) > 1:
+        arg_parser.error("--report можно использовать только с одним разделом форума")
+    if args.urls and not args.save_path and not args.report:
+        arg_parser.error("укажите --save-path")
+    if not args.login and not args.export_report:
+        arg_parser.error("укажите --login")
+    return args
+
+
+def resolve_jobs(args):
+    """Возвращает список пар (URL форума, каталог сохранения)."""
+    if args.report:
+        # Импорт только при необходимости: openpyxl загружается долго
+        from report import get_base_url_and_directory
+        base_url, directory = get_base_url_and_directory(args.report)
+        url = args.urls[0] if args.urls else base_url
+        save_path = args.save_path or directory
+        if not url or not save_path:
+            raise SystemExit(f"Не удалось получить URL или каталог из {args.report}")
+        return [(url, save_path)]
+
+    if len(args.urls) == 1:
+        return [(args.urls[0], args.save_path)]
+    return [(url, os.path.join(args.save_path, forum_folder_name(url))) for url in args.urls]
+
+
+def export_reports(jobs, root_path=None):
+    """Пересобирает report.xlsx каждого каталога из его базы состояния обхода (и общий отчет в root_path)."""
+    from crawl_db import CrawlDatabase, CRAWL_DB_FILE_NAME
+    from report import ReportStore
+
+    failed = 0
+    for url, save_path in jobs:
+        db_path = os.path.join(save_path, CRAWL_DB_FILE_NAME)
+        if not os.path.exists(db_path):
+            logging.error(f"❌ База состояния обхода {db_path} не найдена")
+            failed += 1
+            continue
+        database = CrawlDatabase(db_path, url)
+        report = ReportStore(os.path.join(save_path, "report.xlsx"), database)
+        report.export(force=True)
+        print(f"📊 Отчет выгружен: {report.excel_path} (строк: {len(report)})")
+        database.close()
+
+    if len(jobs) > 1:
+        from coordinator import merge_shard_reports
+        excel_path, rows = merge_shard_reports([{"save_path": save_path} for _, save_path in jobs], root_path)
+        print(f"📊 Общий отчет по {len(jobs)} разделам: {excel_path} (строк: {rows})")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args = parse_args(argv)
+    if args.export_report:
+        return export_reports(resolve_jobs(args), args.save_path)
+
+    password = args.password or os.environ.get("ECU_PASSWORD")
+
+    session = create_session()
+    if auth.restore_session(session, args.cookies):
+        # Пароль (если известен) нужен, чтобы войти заново, когда сессия истечет посреди обхода
+        session.keeper.username, session.keeper.password = args.login, password
+    else:
+        try:
+            auth.login(session, args.login, password or getpass.getpass("Пароль: "), args.cookies)
+        except (auth.LoginError, OSError) as e:
+            logging.error(f"❌ {e}")
+            return 1
+
+    jobs = resolve_jobs(args)
+
+    from parser import DEFAULT_WORKERS, DEFAULT_DOWNLOAD_WORKERS
+    from coordinator import crawl_shard, merge_shard_reports, run_shards
+
+    options = {"workers": args.workers or DEFAULT_WORKERS, "incremental": args.incremental,
+               "use_cache": not args.no_cache, "download_workers": args.download_workers or DEFAULT_DOWNLOAD_WORKERS,
+               "full_pages": args.full_pages, "measure_memory": args.measure_memory}
+    if args.max_bandwidth:
+        options["max_bandwidth"] = args.max_bandwidth * 1024 * 1024
+    if len(jobs) > 1:
+        # Общее хранилище файлов: одинаковые файлы разных разделов скачиваются один раз
+        options["store_path"] = os.path.join(args.save_path, STORE_DIR_NAME)
+
+    shards = []
+    for url, save_path in jobs:
+        shard_options = dict(options, metrics_path=args.metrics_json, prometheus_path=args.prometheus)
+        if len(jobs) > 1:
+            name = forum_folder_name(url)
+            shard_options["store_owner"] = name
+            for key in ("metrics_path", "prometheus_path"):
+                if shard_options[key]:
+                    root, ext = os.path.splitext(shard_options[key])
+                    shard_options[key] = f"{root}.{name}{ext}"
+        shards.append({"url": url, "save_path": save_path, "login": args.login, "password": password,
+                       "cookie_path": args.cookies, "options": shard_options})
+
+    in_processes = args.processes > 1 and len(shards) > 1
+    if in_processes:
+        # Разбор HTML упирается в процессор: разделы обходятся параллельно в отдельных процессах
+        results = list(run_shards(shards, args.processes))
+    else:
+        results = [crawl_shard(shard, session) for shard in shards]
+    failed = sum(1 for result in results if result["error"])
+
+    if len(shards) > 1:
+        excel_path, rows = merge_shard_reports(shards, args.save_path)
+        print(f"📊 Общий отчет по {len(shards)} разделам: {excel_path} (строк: {rows})")
+
+    # Сайт мог обновить cookies за время обхода. Дочерние процессы сами сохраняют cookies после
+    # повторного входа, и устаревшие cookies главного процесса не должны их перезаписать
+    if not in_processes:
+        try:
+            auth.save_cookies(session, args.cookies)
+        except OSError as e:
+            logging.warning(f"⚠️ Не удалось сохранить сессию {args.cookies}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
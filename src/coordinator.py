@@ -0,0 +1,66 @@
+"""Параллельный обход нескольких разделов форума в отдельных процессах.
+
+Каждый раздел (шард) обходится в своем процессе со своей HTTP-сессией, своей базой состояния
+и своим report.xlsx в подпапке раздела; файлы складываются в общее хранилище. В конце отчеты
+разделов сводятся в один общий отчет без повторов.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import auth
+from crawl_db import CRAWL_DB_FILE_NAME
+from http_session import create_session, DEFAULT_RATE
+
+REPORT_FILE_NAME = "report.xlsx"
+
+
+def crawl_shard(shard, session=None):
+    """Обходит один раздел; выполняется в дочернем процессе (или в текущем, если передана session).
+
+    shard — словарь: url, save_path, login, password, cookie_path, options (аргументы Parser)
+    и необязательный rate — лимит запросов в секунду для сессии процесса.
+    Возвращает словарь с url, save_path, количеством тем count и текстом ошибки error (или None).
+    """
+    from parser import Parser  # Импорт в дочернем процессе
+
+    result = {"url": shard["url"], "save_path": shard["save_path"], "count": 0, "error": None}
+    try:
+        if session is None:
+            session = create_session(rate=shard.get("rate", DEFAULT_RATE))
+            # Вход выполнен в главном процессе — дочерний берет его cookies, а пароль нужен для повторного входа
+            if auth.restore_session(session, shard["cookie_path"]):
+                session.keeper.username, session.keeper.password = shard["login"], shard["password"]
+            else:
+                auth.login(session, shard["login"], shard["password"], shard["cookie_path"])
+
+        print(f"Запуск парсинга форума: {shard['url']} -> {shard['save_path']}")
+        parser = Parser(session, shard["url"], shard["save_path"], **shard["options"])
+        result["count"] = sum(1 for _ in parser.parse_forum())
+        result["error"] = parser.session_error
+        print(f"Форум {shard['url']}: обработано {result['count']} тем.")
+    except Exception as e:
+        logging.exception(f"❌ Ошибка парсинга {shard['url']}")
+        result["error"] = str(e) or type(e).__name__
+    return result
+
+
+def run_shards(shards, processes):
+    """Обходит разделы в пуле из processes процессов; отдает результаты по мере завершения."""
+    processes = min(processes, len(shards))
+    # Лимит частоты запросов к сайту делится между процессами, чтобы общая нагрузка не выросла
+    shards = [dict(shard, rate=shard.get("rate", DEFAULT_RATE) / processes) for shard in shards]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(crawl_shard, shard) for shard in shards]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def merge_shard_reports(shards, save_path):
+    """Сводит отчеты разделов в save_path/report.xlsx; возвращает путь к нему и количество строк."""
+    from report import merge_reports
+
+    db_paths = [os.path.join(shard["save_path"], CRAWL_DB_FILE_NAME) for shard in shards]
+    db_paths = [db_path for db_path in db_paths if os.path.exists(db_path)]
+    excel_path = os.path.join(save_path, REPORT_FILE_NAME)
+    return excel_path, merge_reports(db_paths, excel_path)
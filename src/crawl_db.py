@@ -0,0 +1,207 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CRAWL_DB_FILE_NAME = "crawl_state.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    thread_url TEXT,
+    title TEXT,
+    last_post TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS attachments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_url TEXT NOT NULL UNIQUE,
+    thread_url TEXT,
+    title TEXT,
+    file_name TEXT,
+    status TEXT,
+    sha256 TEXT,
+    size INTEGER,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS attachments_thread_url ON attachments (thread_url);
+CREATE TABLE IF NOT EXISTS landing_pages (
+    url TEXT PRIMARY KEY,
+    files TEXT NOT NULL,
+    fetched_at REAL,
+    used_at REAL
+);
+CREATE INDEX IF NOT EXISTS landing_pages_used_at ON landing_pages (used_at);
+"""
+
+
+class CrawlDatabase:
+    """Состояние обхода в SQLite (режим WAL): темы, вложения со статусами и хэшами, служебные значения.
+
+    Одно соединение используется всеми потоками парсера; обращения к нему сериализуются блокировкой,
+    а изменения группируются в транзакции через transaction().
+    """
+
+    def __init__(self, path, main_url=None):
+        self.path = path
+        self.lock = threading.RLock()
+        self.depth = 0  # Глубина вложенных transaction()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.migrate()
+        # Как и в отчете раньше, сохраняется URL форума первого запуска
+        if main_url and self.main_url is None:
+            self.set_meta("main_url", main_url)
+
+    def migrate(self):
+        """Добавляет столбцы, которых не было в базах прежних версий."""
+        columns = {row[1] for row in self.query("PRAGMA table_info(threads)")}
+        if "last_post" not in columns:
+            self.connection.execute("ALTER TABLE threads ADD COLUMN last_post TEXT")
+
+    @property
+    def main_url(self):
+        return self.get_meta("main_url")
+
+    @contextmanager
+    def transaction(self):
+        """Выполняет блок в одной транзакции (вложенные вызовы присоединяются к внешней)."""
+        with self.lock:
+            if self.depth:
+                self.depth += 1
+                try:
+                    yield self.connection
+                finally:
+                    self.depth -= 1
+                return
+
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.depth = 1
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            else:
+                self.connection.execute("COMMIT")
+            finally:
+                self.depth = 0
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def get_meta(self, key, default=None):
+        rows = self.query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else default
+
+    def set_meta(self, key, value):
+        with self.transaction() as connection:
+            if value is None:
+                connection.execute("DELETE FROM meta WHERE key = ?", (key,))
+            else:
+                connection.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                                   "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, str(value)))
+
+    def has_file(self, file_url):
+        return bool(self.query("SELECT 1 FROM attachments WHERE file_url = ?", (file_url,)))
+
+    def has_thread_url(self, thread_url):
+        return bool(self.query("SELECT 1 FROM attachments WHERE thread_url = ? LIMIT 1", (thread_url,)))
+
+    def has_thread(self, thread_id):
+        return bool(self.query("SELECT 1 FROM threads WHERE thread_id = ?", (thread_id,)))
+
+    def thread_last_post(self, thread_id):
+        """Отметка последнего ответа, с которой тема была обработана: (известна ли тема, отметка или None)."""
+        rows = self.query("SELECT last_post FROM threads WHERE thread_id = ?", (thread_id,))
+        return (True, rows[0][0]) if rows else (False, None)
+
+    def add_thread(self, thread_id, thread_url=None, title=None, last_post=None):
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT INTO threads (thread_id, thread_url, title, last_post, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (thread_id) DO UPDATE SET thread_url = coalesce(excluded.thread_url, thread_url), "
+                "title = coalesce(excluded.title, title), last_post = coalesce(excluded.last_post, last_post), "
+                "updated_at = excluded.updated_at",
+                (thread_id, thread_url, title, last_post, time.time()))
+
+    def add_attachment(self, status, title, thread_url, file_url, file_name, sha256=None, size=None):
+        """Добавляет вложение, если его ссылки еще нет. Возвращает True при добавлении."""
+        now = time.time()
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO attachments "
+                "(file_url, thread_url, title, file_name, status, sha256, size, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_url, thread_url, title, file_name, status, sha256, size, now, now))
+            return cursor.rowcount > 0
+
+    def set_status(self, file_url, status, sha256=None, size=None):
+        """Меняет статус вложения (и, если известны, хэш и размер файла)."""
+        with self.transaction() as connection:
+            connection.execute(
+                "UPDATE attachments SET status = ?, sha256 = coalesce(?, sha256), size = coalesce(?, size), "
+                "updated_at = ? WHERE file_url = ?", (status, sha256, size, time.time(), file_url))
+
+    def attachment_thread(self, file_url):
+        """Тема, к которой относится вложение: (название темы, ссылка на тему) или (None, None)."""
+        rows = self.query("SELECT title, thread_url FROM attachments WHERE file_url = ?", (file_url,))
+        return tuple(rows[0]) if rows else (None, None)
+
+    def attachments_with_status(self, statuses):
+        """Вложения с одним из статусов: список (ссылка на файл, название темы, имя файла)."""
+        placeholders = ", ".join("?" * len(statuses))
+        return self.query(f"SELECT file_url, title, file_name FROM attachments WHERE status IN ({placeholders}) "
+                          "ORDER BY id", tuple(statuses))
+
+    def get_landing_page(self, url):
+        """Сохраненный список файлов страницы загрузок: (JSON, время загрузки) или None."""
+        rows = self.query("SELECT files, fetched_at FROM landing_pages WHERE url = ?", (url,))
+        return rows[0] if rows else None
+
+    def put_landing_page(self, url, files, max_entries):
+        """Сохраняет список файлов страницы загрузок, вытесняя давно не использованные сверх max_entries."""
+        now = time.time()
+        with self.transaction() as connection:
+            connection.execute("INSERT INTO landing_pages (url, files, fetched_at, used_at) VALUES (?, ?, ?, ?) "
+                               "ON CONFLICT (url) DO UPDATE SET files = excluded.files, "
+                               "fetched_at = excluded.fetched_at, used_at = excluded.used_at",
+                               (url, files, now, now))
+            connection.execute("DELETE FROM landing_pages WHERE url IN (SELECT url FROM landing_pages "
+                               "ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (max_entries,))
+
+    def touch_landing_page(self, url):
+        with self.transaction() as connection:
+            connection.execute("UPDATE landing_pages SET used_at = ? WHERE url = ?", (time.time(), url))
+
+    def delete_landing_page(self, url):
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM landing_pages WHERE url = ?", (url,))
+
+    def count_attachments(self):
+        return self.query("SELECT count(*) FROM attachments")[0][0]
+
+    def iter_attachments(self, batch_size=1000):
+        """Построчно отдает вложения в порядке добавления, не загружая всю таблицу в память."""
+        last_id = 0
+        while True:
+            rows = self.query("SELECT id, status, title, thread_url, file_url, file_name FROM attachments "
+                              "WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+            if not rows:
+                return
+            for row in rows:
+                yield row[1:]
+            last_id = rows[-1][0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,109 @@
+import itertools
+import queue
+import threading
+from urllib.parse import urljoin
+
+from http_session import TokenBucket
+
+DEFAULT_DOWNLOAD_WORKERS = 2
+POLL_INTERVAL = 0.1  # секунд между проверками остановки
+UNKNOWN_SIZE = float("inf")  # Файлы неизвестного размера скачиваются после всех известных
+PENDING_PER_THREAD = 4  # файлов в очереди на каждую тему, которая может быть «в работе» у конвейера
+
+
+class DownloadScheduler:
+    """Очередь скачивания файлов, независимая от разбора тем.
+
+    Файлы скачиваются в workers отдельных потоках, от меньших к большим (размер берется из проверки
+    вложения), так что отчет быстро заполняется, а большие файлы не задерживают разбор форума.
+    max_bandwidth (байт/с) ограничивает общую скорость всех скачиваний. Строка отчета получает
+    статус «Скачан» только после того, как файл целиком лег в хранилище.
+
+    В очереди не больше max_pending файлов: когда скачивание отстает от разбора, запись тем ждет
+    места, и очередь не растет всю дорогу обхода. Порядок по размеру действует внутри этого окна.
+    """
+
+    def __init__(self, parser, workers=DEFAULT_DOWNLOAD_WORKERS, max_bandwidth=None, max_pending=None):
+        self.parser = parser
+        self.workers = max(1, int(workers))
+        # По умолчанию окно в несколько раз больше числа тем «в работе» у конвейера (workers * 4)
+        self.max_pending = max_pending or PENDING_PER_THREAD * parser.workers * 4
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()  # При равном размере файлы идут в порядке постановки
+        self.pending = 0  # Файлов в очереди и в работе
+        self.idle = threading.Condition()
+        self.stopped = threading.Event()
+        self.threads = []
+        self.bandwidth = None
+        if max_bandwidth:
+            # Ведро вмещает хотя бы один блок чтения, иначе блок никогда бы не дождался токенов
+            self.bandwidth = TokenBucket(max_bandwidth, max(max_bandwidth, parser.chunk_size))
+
+    def start(self):
+        self.stopped.clear()
+        self.threads = [threading.Thread(target=self.worker, daemon=True) for _ in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, attachments, thread_folder, wait=True):
+        """Ставит вложения темы в очередь скачивания, ожидая места в ней (не больше max_pending файлов).
+
+        wait=False ставит файлы без ожидания: так делают сами потоки скачивания (они не могут ждать
+        себя) и перезапуск с файлами прошлых запусков, уже прочитанными из базы.
+        """
+        for attachment in attachments:
+            size = self.expected_size(urljoin(self.parser.base_url, attachment["url"]))
+            with self.idle:
+                while (wait and self.pending >= self.max_pending and not self.stopped.is_set()
+                       and not self.parser.cancelled):
+                    self.idle.wait(POLL_INTERVAL)
+                self.pending += 1
+            self.parser.add_stat("files_queued")
+            self.queue.put((size, next(self.order), attachment, thread_folder))
+
+    def expected_size(self, file_url):
+        """Размер файла по заголовкам проверки вложения; уже скачанные файлы обрабатываются сразу."""
+        if self.parser.store.lookup(file_url):
+            return 0
+        size = self.parser.known_size(file_url)
+        return UNKNOWN_SIZE if size is None else size
+
+    def throttle(self, size):
+        """Ждет, пока общий лимит скорости позволит принять еще size байт."""
+        if self.bandwidth:
+            self.bandwidth.acquire(size)
+
+    def worker(self):
+        while not self.stopped.is_set():
+            try:
+                _, _, attachment, thread_folder = self.queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            try:
+                self.parser.download_queued(attachment, thread_folder)
+            finally:
+                self.parser.add_stat("files_queued", -1)
+                with self.idle:
+                    self.pending -= 1
+                    self.idle.notify_all()
+
+    def join(self):
+        """Ждет, пока очередь опустеет (или обход будет отменен)."""
+        with self.idle:
+            while self.pending and not self.parser.cancelled:
+                self.idle.wait(POLL_INTERVAL)
+
+    def stop(self):
+        """Останавливает потоки скачивания после текущих файлов; остаток очереди сохраняется в отчете."""
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.parser.add_stat("files_queued", -1)
+        with self.idle:
+            self.pending = 0
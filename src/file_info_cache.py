@@ -0,0 +1,113 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 24 * 3600  # секунд, после которых страница загрузок запрашивается заново
+DEFAULT_MAX_ENTRIES = 10000
+MEMORY_ENTRIES = 1000  # записей, которые держатся в памяти поверх базы
+
+
+class Flight:
+    """Загрузка страницы, которую ждут другие потоки."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.files = []
+        self.error = None
+
+
+class FileInfoCache:
+    """Кэш списков файлов {name, url} со страниц загрузок, на которые ссылаются темы.
+
+    Записи хранятся в базе состояния обхода (переживают перезапуск), живут ttl секунд, а сверх
+    max_entries вытесняются давно не использованные. Одновременные запросы одной страницы из разных
+    потоков ждут единственную загрузку.
+    """
+
+    def __init__(self, database, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.database = database
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()  # url -> (файлы, время загрузки)
+        self.loading = {}  # url -> Flight идущей загрузки
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, url):
+        """Возвращает сохраненный и еще не устаревший список файлов или None."""
+        with self.lock:
+            entry = self.memory.get(url)
+            if entry:
+                self.memory.move_to_end(url)
+        if entry is None:
+            if not (row := self.database.get_landing_page(url)):
+                return None
+            entry = (json.loads(row[0]), row[1])
+            self.remember(url, entry)
+
+        files, fetched_at = entry
+        if time.time() - fetched_at > self.ttl:
+            self.forget(url)
+            return None
+        self.database.touch_landing_page(url)
+        with self.lock:
+            self.hits += 1
+        return [dict(file) for file in files]
+
+    def get(self, url, load):
+        """Список файлов страницы url: из кэша или от load(url); пустой результат не сохраняется.
+
+        Пока страница загружается, остальные потоки ждут ту же загрузку и получают ее результат
+        (или ее исключение).
+        """
+        if (files := self.lookup(url)) is not None:
+            return files
+
+        with self.lock:
+            flight = self.loading.get(url)
+            # Загрузка могла завершиться между проверкой кэша и блокировкой
+            finished = flight is None and url in self.memory
+            owner = flight is None and not finished
+            if owner:
+                flight = self.loading[url] = Flight()
+                self.misses += 1
+
+        if finished:
+            return self.get(url, load)
+        if not owner:
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return [dict(file) for file in flight.files]
+
+        try:
+            flight.files = load(url)
+            if flight.files:
+                self.put(url, flight.files)
+            return flight.files
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.loading[url]
+            flight.done.set()
+
+    def put(self, url, files):
+        entry = ([dict(file) for file in files], time.time())
+        self.database.put_landing_page(url, json.dumps(entry[0], ensure_ascii=False), self.max_entries)
+        self.remember(url, entry)
+
+    def remember(self, url, entry):
+        with self.lock:
+            self.memory[url] = entry
+            self.memory.move_to_end(url)
+            while len(self.memory) > MEMORY_ENTRIES:
+                self.memory.popitem(last=False)
+
+    def forget(self, url):
+        with self.lock:
+            self.memory.pop(url, None)
+        self.database.delete_landing_page(url)
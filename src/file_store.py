@@ -0,0 +1,137 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+STORE_DIR_NAME = ".file_store"
+INDEX_LOCK_TIMEOUT = 30  # секунд ожидания блокировки индекса другим процессом
+
+
+class FileStore:
+    """Хранилище скачанных файлов по содержимому (SHA-256).
+
+    Каждый уникальный файл хранится один раз в objects/<2 символа>/<sha256>, а в папках тем
+    создаются жесткие ссылки на него (или копии, если ссылку создать нельзя). Индекс index.json
+    связывает ссылку на файл с его хэшем, размером и именем, чтобы повторно его не скачивать.
+    """
+
+    def __init__(self, root, owner=None):
+        """owner — имя отдельного подкаталога tmp/ для недокачанных файлов, когда хранилищем одновременно
+        пользуются несколько процессов (иначе они писали бы в один и тот же .part)."""
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.tmp_dir = os.path.join(root, "tmp", owner) if owner else os.path.join(root, "tmp")
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        self.urls = {}  # ссылка -> {"sha256", "size", "name"}
+        self.dirty = False
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.urls = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"❌ Не удалось прочитать индекс хранилища {self.index_path}: {e}")
+
+    def save_index(self):
+        """Атомарно записывает индекс, если он изменился, сохраняя записи, добавленные другими процессами."""
+        with self.lock:
+            if not self.dirty:
+                return
+            with self.index_file_lock():
+                if os.path.exists(self.index_path):
+                    try:
+                        with open(self.index_path, "r", encoding="utf-8") as f:
+                            for file_url, entry in json.load(f).items():
+                                self.urls.setdefault(file_url, entry)
+                    except (OSError, ValueError) as e:
+                        logging.error(f"❌ Не удалось прочитать индекс хранилища {self.index_path}: {e}")
+                tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.urls, f, ensure_ascii=False)
+                os.replace(tmp_path, self.index_path)
+            self.dirty = False
+
+    @contextmanager
+    def index_file_lock(self):
+        """Межпроцессная блокировка индекса: файл-замок, создаваемый атомарно (работает и в Windows)."""
+        lock_path = self.index_path + ".lock"
+        deadline = time.monotonic() + INDEX_LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    # Замок, оставленный упавшим процессом, снимаем
+                    if time.time() - os.path.getmtime(lock_path) > INDEX_LOCK_TIMEOUT:
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Индекс хранилища занят другим процессом: {lock_path}")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.remove(lock_path)
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def lookup(self, file_url):
+        """Возвращает запись индекса, если файл по ссылке уже лежит в хранилище целиком."""
+        with self.lock:
+            entry = self.urls.get(file_url)
+        if not entry:
+            return None
+        try:
+            if os.path.getsize(self.object_path(entry["sha256"])) == entry["size"]:
+                return entry
+        except OSError:
+            pass
+        return None
+
+    def part_path(self, file_url):
+        """Путь недокачанного файла внутри хранилища: постоянный для ссылки, чтобы докачку можно было продолжить."""
+        return os.path.join(self.tmp_dir, hashlib.sha1(file_url.encode("utf-8")).hexdigest() + ".part")
+
+    def add(self, file_url, tmp_path, sha256, size, name):
+        """Атомарно переносит проверенный .part в хранилище (или удаляет, если такое содержимое уже есть)."""
+        object_path = self.object_path(sha256)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        with self.lock:
+            if os.path.exists(object_path):
+                os.remove(tmp_path)
+                logging.info(f"♻️ Содержимое {file_url} уже есть в хранилище ({sha256[:12]})")
+            else:
+                os.replace(tmp_path, object_path)
+            entry = self.urls[file_url] = {"sha256": sha256, "size": size, "name": name}
+            self.dirty = True
+        return entry
+
+    def link(self, sha256, dest_path):
+        """Создает в папке темы жесткую ссылку на файл хранилища, при невозможности — копию."""
+        object_path = self.object_path(sha256)
+        try:
+            os.link(object_path, dest_path)
+        except OSError:
+            shutil.copyfile(object_path, dest_path)
+
+    def is_same_file(self, sha256, path):
+        """Проверяет, что path — уже ссылка на этот объект хранилища."""
+        try:
+            return os.path.samefile(self.object_path(sha256), path)
+        except OSError:
+            return False
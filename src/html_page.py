@@ -0,0 +1,57 @@
+import importlib.util
+import logging
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+
+def detect_html_backend():
+    """Выбирает самый быстрый доступный движок разбора HTML для BeautifulSoup."""
+    return "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+
+
+HTML_BACKEND = detect_html_backend()
+logging.debug(f"Движок разбора HTML: {HTML_BACKEND}")
+
+# Фрагменты страниц списка тем и страниц темы, которые читает парсер (по классам элементов):
+# темы списка (ссылка и отметка последнего ответа), заголовок и кнопка «Скачать», сообщения,
+# списки вложений и навигация по страницам
+PAGE_PARTS = frozenset({"structItem", "structItem-title", "p-title", "p-title-pageAction", "js-replyNewMessageContainer",
+                        "attachmentList"})
+PAGE_PART_PREFIXES = ("pageNav",)
+
+
+def is_page_part(class_value):
+    """Нужен ли парсеру элемент с таким атрибутом class (строка классов целиком)."""
+    return bool(class_value) and any(name in PAGE_PARTS or name.startswith(PAGE_PART_PREFIXES)
+                                     for name in class_value.split())
+
+
+# Целевой разбор: в дерево попадают только нужные элементы с их содержимым, остальная разметка
+# (меню, подвалы, скрипты, реклама) пропускается при разборе и не создается вовсе
+PAGE_STRAINER = SoupStrainer(class_=is_page_part)
+
+
+class HtmlPage:
+    """HTML-страница, разобранная один раз и общая для всех функций извлечения данных."""
+
+    def __init__(self, html, url=None, backend=HTML_BACKEND, parse_only=None):
+        """parse_only — SoupStrainer, ограничивающий дерево нужными фрагментами (None — вся страница)."""
+        self.url = url
+        self.soup = BeautifulSoup(html, backend, parse_only=parse_only)
+
+    @classmethod
+    def of(cls, source):
+        """Возвращает уже разобранную страницу как есть, а строку HTML разбирает."""
+        return source if isinstance(source, cls) else cls(source)
+
+    def find(self, *args, **kwargs):
+        return self.soup.find(*args, **kwargs)
+
+    def find_all(self, *args, **kwargs):
+        return self.soup.find_all(*args, **kwargs)
+
+    def select(self, selector):
+        return self.soup.select(selector)
+
+    def select_one(self, selector):
+        return self.soup.select_one(selector)
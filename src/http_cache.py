@@ -0,0 +1,175 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+CACHE_DIR_NAME = ".http_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 3600  # секунд
+
+
+class ResponseCache:
+    """Дисковый кэш HTML-ответов с условными запросами (ETag / Last-Modified).
+
+    Ответ сохраняется, только если сервер прислал валидатор. При повторном запросе отправляются
+    If-None-Match / If-Modified-Since, и на 304 возвращается тело из кэша. Размер кэша ограничен
+    max_bytes (вытесняются давно не использованные записи), возраст записей — max_age секунд.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.entries = {}  # ключ -> метаданные записи
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.load_index()
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def body_path(self, key):
+        return os.path.join(self.directory, f"{key}.body")
+
+    def meta_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load_index(self):
+        """Собирает индекс из файлов метаданных и сразу удаляет устаревшие записи."""
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(".json"):
+                continue
+            key = file_name[:-len(".json")]
+            try:
+                with open(self.meta_path(key), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                self.remove(key)
+                continue
+
+            if self.is_expired(meta) or not os.path.exists(self.body_path(key)):
+                self.remove(key)
+                continue
+            self.entries[key] = meta
+            self.total_bytes += meta["size"]
+
+        self.evict()
+
+    def is_expired(self, meta):
+        return time.time() - meta["stored_at"] > self.max_age
+
+    def fetch(self, session, url, **kwargs):
+        """Выполняет GET с условными заголовками и возвращает текст страницы (из кэша при 304)."""
+        key = self.key(url)
+        with self.lock:
+            meta = self.entries.get(key)
+            if meta and self.is_expired(meta):
+                self.remove(key)
+                meta = None
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = session.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304:
+            if meta and (body := self.read_body(key)) is not None:
+                self.hits += 1
+                with self.lock:
+                    meta["used_at"] = time.time()
+                return body.decode(meta.get("encoding") or "utf-8", errors="replace")
+
+            # Тело записи пропало (например, вытеснено во время запроса) — у 304 тела нет,
+            # поэтому запись удаляется, а страница запрашивается заново без условных заголовков
+            with self.lock:
+                self.remove(key)
+            headers.pop("If-None-Match", None)
+            headers.pop("If-Modified-Since", None)
+            response = session.get(url, headers=headers, **kwargs)
+
+        response.raise_for_status()
+        self.misses += 1
+        if response.status_code == 200:
+            self.store(key, url, response)
+        return response.text
+
+    def read_body(self, key):
+        try:
+            with open(self.body_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            with self.lock:
+                self.remove(key)
+            return None
+
+    def store(self, key, url, response):
+        """Сохраняет ответ, если у него есть ETag или Last-Modified."""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+
+        now = time.time()
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "encoding": response.encoding,
+            "size": len(body),
+            "stored_at": now,
+            "used_at": now,
+        }
+        try:
+            self.write_atomic(self.body_path(key), body)
+            self.write_atomic(self.meta_path(key), json.dumps(meta).encode("utf-8"))
+        except OSError as e:
+            logging.error(f"❌ Не удалось сохранить {url} в кэш: {e}")
+            return
+
+        with self.lock:
+            if old := self.entries.get(key):
+                self.total_bytes -= old["size"]
+            self.entries[key] = meta
+            self.total_bytes += meta["size"]
+            self.evict()
+
+    @staticmethod
+    def write_atomic(path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Удаляет давно не использованные записи, пока кэш не уложится в max_bytes (вызывать под lock)."""
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["used_at"]):
+            self.remove(key)
+            if self.total_bytes <= self.max_bytes * 0.9:
+                break
+
+    def remove(self, key):
+        """Удаляет запись из индекса и с диска (вызывать под lock)."""
+        if meta := self.entries.pop(key, None):
+            self.total_bytes -= meta["size"]
+        for path in (self.body_path(key), self.meta_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
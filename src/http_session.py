@@ -0,0 +1,126 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 16
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5  # секунд, удваивается с каждой попыткой
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_RATE = 5.0  # запросов в секунду на один хост
+DEFAULT_BURST = 10
+CONNECT_TIMEOUT = 5  # секунд
+READ_TIMEOUT = 30  # секунд
+DOWNLOAD_TIMEOUT = 30 * 60  # секунд на скачивание одного файла целиком
+
+
+class TokenBucket:
+    """Ограничитель частоты «ведро токенов»: rate токенов в секунду, не больше capacity за раз."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Блокирует поток, пока в ведре не наберется нужное количество токенов."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedSession(requests.Session):
+    """Сессия с ограничением частоты запросов на каждый хост и таймаутом по умолчанию."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.buckets = {}
+        self.buckets_lock = threading.Lock()
+        # Повторный вход при истекшей сессии (auth.SessionKeeper), задается при входе на сайт
+        self.keeper = None
+        self.retry = None  # Правило повторов urllib3 для адаптеров пула
+        self.pool_size = 0  # Соединений на хост в пуле, подключенном mount_pool
+
+    def mount_pool(self, pool_size):
+        """Подключает адаптер с пулом на pool_size соединений к каждому хосту и повторами self.retry."""
+        old_adapter = self.adapters.get("https://")
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=self.retry)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self.pool_size = pool_size
+        if old_adapter:
+            old_adapter.close()
+
+    def ensure_pool_size(self, pool_size):
+        """Увеличивает пул соединений, если в нем меньше pool_size (вызывать, пока запросов нет)."""
+        if pool_size > self.pool_size:
+            self.mount_pool(pool_size)
+
+    def bucket_for(self, url):
+        host = urlsplit(url).netloc
+        with self.buckets_lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def request(self, method, url, *args, **kwargs):
+        keeper = self.keeper
+        generation = keeper.generation if keeper else None
+        response = self.send_limited(method, url, *args, **kwargs)
+
+        # Сайт завершил сессию: входим заново (один раз на все потоки) и повторяем запрос
+        if keeper and keeper.needs_login(response):
+            response.close()
+            keeper.reauthenticate(self, generation)
+            response = self.send_limited(method, url, *args, **kwargs)
+            keeper.check_replay(response)
+        return response
+
+    def send_limited(self, method, url, *args, **kwargs):
+        """Запрос с лимитом частоты и таймаутом по умолчанию, без проверки сессии."""
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if self.rate:
+            self.bucket_for(url).acquire()
+        return super().request(method, url, *args, **kwargs)
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                   rate=DEFAULT_RATE, burst=DEFAULT_BURST, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+    """Создает общую HTTP-сессию: пул соединений, повторы с экспоненциальной паузой и лимит частоты.
+
+    Повторяются GET/HEAD при обрывах соединения, таймаутах и ответах 429/5xx, с учетом Retry-After.
+    rate=0 отключает ограничение частоты.
+    """
+    session = RateLimitedSession(rate=rate, burst=burst, timeout=timeout)
+    session.retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    session.mount_pool(pool_size)
+    return session
+
+
+def pool_size_for(workers, download_workers):
+    """Соединений, нужных обходу одновременно: темы и страницы внутри тем (по workers потоков),
+    скачивания и поток списка тем."""
+    return workers * 2 + download_workers + 1
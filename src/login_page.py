@@ -1,16 +1,51 @@
 import tkinter as tk
 from tkinter import messagebox
-import requests
 import logging
+import queue
+import threading
+
+import auth
+from http_session import create_session
+
+POLL_INTERVAL_MS = 200
 
 
 class LoginPage:
     def __init__(self, root, on_success):
         self.root = root
         self.on_success = on_success
-        self.session = requests.Session()
+        self.session = create_session()
+
+        self.logged_in = False
+        self.restore_results = queue.Queue()
 
         self.create_ui()
+        # Сессия прошлого запуска еще действительна — вход не нужен. Проверка идет запросом к сайту,
+        # поэтому выполняется в фоновом потоке, чтобы окно не зависало без сети
+        threading.Thread(target=self.try_restore_session, daemon=True).start()
+        self.root.after(POLL_INTERVAL_MS, self.poll_restore)
+
+    def try_restore_session(self):
+        """Выполняется в фоновом потоке: проверяет сохраненную сессию в отдельной HTTP-сессии."""
+        session = create_session()
+        try:
+            restored = auth.restore_session(session)
+        except Exception:
+            logging.exception("Ошибка восстановления сессии")
+            restored = False
+        self.restore_results.put(session if restored else None)
+
+    def poll_restore(self):
+        """Ждет результат проверки сохраненной сессии; вызывается циклом Tk."""
+        try:
+            session = self.restore_results.get_nowait()
+        except queue.Empty:
+            self.root.after(POLL_INTERVAL_MS, self.poll_restore)
+            return
+        # Пользователь мог войти вручную, пока шла проверка
+        if session and not self.logged_in:
+            self.logged_in = True
+            self.on_success(session)
 
     def create_ui(self):
         tk.Label(self.root, text="Логин:").grid(row=0, column=0, padx=10, pady=10)
@@ -27,31 +62,18 @@ class LoginPage:
         login = self.login_entry.get()
         password = self.password_entry.get()
 
-        logging.info("Начинаем процесс входа...")
-
-        login_url = "https://ecu-firmware-files.ru/login"
-        post_url = "https://ecu-firmware-files.ru/login/login"
-
-        payload = {"login": login, "password": password, "remember": "1"}
-        headers = {"User-Agent": "Mozilla/5.0"}
-
         try:
-            response = self.session.get(login_url, headers=headers)
-            logging.info(f"Получен ответ от страницы входа: {response.status_code}")
-
-            if response.status_code != 200:
-                messagebox.showerror("Ошибка", f"Ошибка входа: {response.status_code}")
-                return
-
-            login_response = self.session.post(post_url, data=payload, headers=headers)
-            logging.info(f"Ответ на вход: {login_response.status_code}")
-
-            if login_response.status_code == 200 and "/account/" in login_response.text:
-                logging.info("Вход выполнен успешно!")
-                messagebox.showinfo("Успех", "Вход выполнен успешно!")
-                self.on_success(self.session)  # Переход к URL-вводу
-            else:
-                messagebox.showerror("Ошибка", "Ошибка входа. Проверьте логин и пароль.")
+            auth.login(self.session, login, password)
+        except auth.LoginError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
         except Exception as e:
             logging.exception("Ошибка входа")
             messagebox.showerror("Ошибка", str(e))
+            return
+
+        if self.logged_in:
+            return
+        self.logged_in = True
+        messagebox.showinfo("Успех", "Вход выполнен успешно!")
+        self.on_success(self.session)  # Переход к URL-вводу
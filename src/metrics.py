@@ -0,0 +1,199 @@
+import functools
+import json
+import math
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+METRICS_FILE_NAME = "crawl_metrics.json"
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, math.inf)
+# Границы корзин гистограмм памяти, байты (от 64 КиБ до 1 ГиБ)
+MEMORY_BUCKETS = tuple(2 ** power for power in range(16, 31, 2)) + (math.inf,)
+DEFAULT_EXPORT_INTERVAL = 10.0  # секунд между выгрузками в формате Prometheus
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: задержки в секундах или объемы памяти в байтах."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, unit="seconds"):
+        self.buckets = buckets
+        self.unit = unit
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Оценка квантиля по корзинам (верхняя граница корзины, в которую он попадает)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        unit = self.unit
+        return {
+            "count": self.count,
+            f"total_{unit}": round(self.total, 6),
+            f"mean_{unit}": round(self.total / self.count, 6) if self.count else 0.0,
+            f"min_{unit}": round(self.min, 6) if self.count else 0.0,
+            f"max_{unit}": round(self.max, 6),
+            f"p50_{unit}": self.quantile(0.5),
+            f"p95_{unit}": self.quantile(0.95),
+            "buckets": {("+Inf" if math.isinf(bound) else str(bound)): count
+                        for bound, count in zip(self.buckets, self.counts)},
+        }
+
+
+class Metrics:
+    """Счетчики и таймеры стадий обхода с выгрузкой в JSON и в текстовый формат Prometheus."""
+
+    def __init__(self, prometheus_path=None, export_interval=DEFAULT_EXPORT_INTERVAL):
+        self.prometheus_path = prometheus_path
+        self.export_interval = export_interval
+        self.started_at = time.time()
+        self.counters = {}
+        self.stages = {}
+        self.memory = {}  # Стадия -> гистограмма пиковой памяти, байты
+        self.lock = threading.Lock()
+        self.memory_lock = threading.Lock()
+        self.last_export = 0.0
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_counter(self, name, value):
+        """Устанавливает значение счетчика, который ведется в другом месте (например, попадания в кэш)."""
+        with self.lock:
+            self.counters[name] = value
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """Замеряет время выполнения блока и добавляет его в гистограмму стадии."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def observe_memory(self, stage, size):
+        with self.lock:
+            if stage not in self.memory:
+                self.memory[stage] = Histogram(MEMORY_BUCKETS, "bytes")
+            self.memory[stage].observe(size)
+
+    @contextmanager
+    def memory_peak(self, stage, held=0):
+        """Замеряет пик памяти (tracemalloc) за время блока и добавляет его в гистограмму памяти стадии.
+
+        held — байты, занятые к началу блока его входными данными (например, текстом страницы).
+        tracemalloc считает память всего процесса, поэтому замеряемые блоки выполняются по одному;
+        память, выделенная в это время другими потоками, тоже попадает в замер. Если трассировка
+        памяти не запущена, блок просто выполняется.
+        """
+        if not tracemalloc.is_tracing():
+            yield
+            return
+
+        with self.memory_lock:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            try:
+                yield
+            finally:
+                self.observe_memory(stage, held + tracemalloc.get_traced_memory()[1] - before)
+
+    def summary(self):
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "elapsed_seconds": round(time.time() - self.started_at, 3),
+                "counters": dict(self.counters),
+                "stages": {stage: histogram.summary() for stage, histogram in self.stages.items()},
+                "memory": {stage: histogram.summary() for stage, histogram in self.memory.items()},
+            }
+
+    def write_json(self, path):
+        """Записывает итоговую сводку в JSON."""
+        write_atomic(path, json.dumps(self.summary(), ensure_ascii=False, indent=2))
+
+    def prometheus_text(self):
+        """Текущее состояние в текстовом формате Prometheus."""
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE ecu_parser_{name}_total counter")
+                lines.append(f"ecu_parser_{name}_total {value}")
+
+            lines += histogram_lines("ecu_parser_stage_seconds", self.stages)
+            if self.memory:
+                lines += histogram_lines("ecu_parser_memory_peak_bytes", self.memory)
+        return "\n".join(lines) + "\n"
+
+    def export(self, force=False):
+        """Выгружает метрики в файл Prometheus, если он задан и подошел срок (или force)."""
+        if not self.prometheus_path:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_export < self.export_interval:
+            return
+        self.last_export = now
+        write_atomic(self.prometheus_path, self.prometheus_text())
+
+
+def histogram_lines(name, histograms):
+    """Строки гистограмм стадий в текстовом формате Prometheus."""
+    lines = [f"# TYPE {name} histogram"]
+    for stage, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            le = "+Inf" if math.isinf(bound) else bound
+            lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total:.6f}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+    return lines
+
+
+def write_atomic(path, text):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def timed(stage):
+    """Декоратор метода: замеряет его время в self.metrics под именем стадии."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer(stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,57 +1,286 @@
+import hashlib
 import os
 import re
 import logging
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlsplit, urljoin, unquote
 
-import openpyxl
-import pandas as pd
 import requests
-from bs4 import BeautifulSoup
+from requests.structures import CaseInsensitiveDict
+
+from auth import SITE_URL, SessionExpired
+from checkpoint import Checkpoint, CHECKPOINT_FILE_NAME
+from crawl_db import CrawlDatabase, CRAWL_DB_FILE_NAME
+from download_scheduler import DownloadScheduler, DEFAULT_DOWNLOAD_WORKERS
+from file_info_cache import FileInfoCache
+from file_store import FileStore, STORE_DIR_NAME
+from html_page import HtmlPage, PAGE_STRAINER
+from pipeline import CrawlPipeline
+from post_index import PostIndex, post_key
+from http_cache import ResponseCache, CACHE_DIR_NAME
+from http_session import CONNECT_TIMEOUT, READ_TIMEOUT, DOWNLOAD_TIMEOUT, pool_size_for
+from metrics import Metrics, METRICS_FILE_NAME, timed
+from report import ReportStore, STATUS_QUEUED, STATUS_DONE, STATUS_FAILED, STATUS_SKIPPED
+
+
+DEFAULT_WORKERS = 4
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # байт за одно чтение при скачивании файла
+DOWNLOAD_ATTEMPTS = 3  # попыток докачать файл после обрыва
+PROBE_CACHE_ENTRIES = 10000  # проверенных вложений, заголовки которых держатся в памяти
+PROBE_HEADERS = ("Content-Type", "Content-Length", "Content-Disposition")  # заголовки, нужные парсеру
+
+
+def thread_dir_name(title):
+    """Имя папки темы по ее названию."""
+    return re.sub(r'[\\/|?&"<>* :]', '_', title)
+
+
+class CrawlCancelled(Exception):
+    """Обход форума отменен пользователем."""
+
+
+class IncompleteDownload(requests.RequestException):
+    """Файл скачан не полностью; его .part можно докачать."""
+
+
+class UnexpectedPage(requests.RequestException):
+    """Вместо файла сервер отдал HTML-страницу."""
 
 
 class Parser:
-    def __init__(self, session, main_url, save_path="./"):
-        """Конструктор парсера."""
+    def __init__(self, session, main_url, save_path="./", workers=DEFAULT_WORKERS, incremental=False,
+                 use_cache=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), download_timeout=DOWNLOAD_TIMEOUT,
+                 listener=None, store_path=None, chunk_size=DEFAULT_CHUNK_SIZE, metrics_path=None,
+                 prometheus_path=None, base_url=SITE_URL, download_workers=DEFAULT_DOWNLOAD_WORKERS,
+                 max_bandwidth=None, store_owner=None, full_pages=False, measure_memory=False):
+        """Конструктор парсера.
+
+        workers — количество тем, обрабатываемых одновременно (1 — последовательный режим).
+        incremental — обходить форум с первой страницы и остановиться на странице, где все темы уже известны
+        и в них нет новых ответов.
+        use_cache — хранить HTML-страницы в дисковом кэше и запрашивать их условно (ETag / Last-Modified).
+        timeout — таймауты (подключение, чтение) для каждого запроса, download_timeout — на весь файл.
+        listener — функция, получающая события хода обхода (словари с ключом "type"); вызывается из фоновых потоков.
+        store_path — каталог хранилища файлов по содержимому (по умолчанию внутри save_path); общий каталог
+        позволяет не скачивать одинаковые файлы повторно для разных форумов.
+        chunk_size — размер блока при скачивании файлов.
+        metrics_path — куда записать JSON-сводку метрик в конце обхода (по умолчанию crawl_metrics.json в save_path);
+        prometheus_path — файл, в который периодически выгружаются метрики в формате Prometheus.
+        base_url — адрес сайта, к которому достраиваются относительные ссылки.
+        download_workers — количество файлов, скачиваемых одновременно (отдельно от разбора тем);
+        max_bandwidth — общий лимит скорости скачивания файлов в байтах в секунду (None — без лимита).
+        store_owner — имя каталога недокачанных файлов в общем хранилище (нужно, если им одновременно
+        пользуются несколько процессов).
+        full_pages — разбирать страницы списка и тем целиком, а не только нужные парсеру фрагменты.
+        measure_memory — замерять пиковую память разбора каждой страницы (tracemalloc); разбор страниц
+        при этом идет по одному и заметно медленнее, поэтому режим предназначен для диагностики.
+        """
         self.session = session
         self.save_path = save_path
         self.main_url = main_url
-        self.base_url = "https://ecu-firmware-files.ru"
+        self.base_url = base_url
         self.excel_path = os.path.join(self.save_path, "report.xlsx")
+        self.workers = max(1, int(workers))
+        self.incremental = incremental
+        self.timeout = timeout
+        self.download_timeout = download_timeout
+        self.chunk_size = chunk_size
+        self.metrics_path = metrics_path or os.path.join(self.save_path, METRICS_FILE_NAME)
+        self.metrics = Metrics(prometheus_path)
+        self.listener = listener
+        self.page_strainer = None if full_pages else PAGE_STRAINER
+        self.measure_memory = measure_memory
+        self._traces_memory = False  # Трассировку памяти запустил этот парсер
+
+        # Счетчики хода обхода для отображения прогресса
+        self.stats = {"pages_done": 0, "total_pages": 0, "threads_done": 0, "bytes_downloaded": 0,
+                      "files_queued": 0}
+        self._stats_lock = threading.Lock()
+
+        # Пауза (событие сброшено) и отмена обхода
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+        self._closed = False
+        self.session_error = None  # Почему обход остановлен из-за истекшей сессии (None — не останавливался)
+
+        self._fs_lock = threading.Lock()
+        # Заголовки уже проверенных вложений: ссылка -> заголовки ответа; запись живет до скачивания
+        # файла, а сверх PROBE_CACHE_ENTRIES вытесняются давно не использованные
+        self._probe_cache = OrderedDict()
+        self._probe_lock = threading.Lock()
+        # Отметки последнего ответа тем из списка: ссылка -> отметка (сохраняется вместе с темой)
+        self._listing_markers = {}
+        # Отдельный пул для страниц внутри темы: темы сами обрабатываются в пуле потоков
+        self._page_pool = None
+        self._page_pool_lock = threading.Lock()
+
         if not os.path.exists(save_path):
             os.makedirs(save_path)
 
+        # Состояние обхода (темы, вложения, страница для продолжения) хранится в SQLite,
+        # report.xlsx лишь выгружается из базы
+        self.database = CrawlDatabase(os.path.join(self.save_path, CRAWL_DB_FILE_NAME), self.main_url)
+        self.report = ReportStore(self.excel_path, self.database)
+        self.checkpoint = Checkpoint(self.database, self.main_url, os.path.join(self.save_path, CHECKPOINT_FILE_NAME))
+        # Списки файлов страниц загрузок, на которые ссылаются многие темы
+        self.file_info = FileInfoCache(self.database)
+        self.cache = ResponseCache(os.path.join(self.save_path, CACHE_DIR_NAME)) if use_cache else None
+        self.store = FileStore(store_path or os.path.join(self.save_path, STORE_DIR_NAME), store_owner)
+        self.downloads = DownloadScheduler(self, download_workers, max_bandwidth)
+        # Пул соединений сессии должен вместить все потоки обхода, иначе urllib3 будет закрывать
+        # лишние соединения и открывать новые
+        if hasattr(session, "ensure_pool_size"):
+            session.ensure_pool_size(pool_size_for(self.workers, self.downloads.workers))
+
+    def emit(self, event_type, **fields):
+        """Передает событие хода обхода слушателю, если он задан."""
+        if self.listener:
+            self.listener({"type": event_type, **fields})
+
+    def add_stat(self, name, value=1):
+        with self._stats_lock:
+            self.stats[name] += value
+
+    def pause(self):
+        """Приостанавливает обход на ближайшей границе темы, страницы или файла."""
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        """Отменяет обход; незавершенные темы и нескачанные файлы будут обработаны при следующем запуске."""
+        self._cancelled.set()
+        self._running.set()
+
+    def session_expired(self, error):
+        """Останавливает обход: без входа сайт отдает страницы без сообщений, продолжать бессмысленно."""
+        logging.error(f"⛔ {error} Обход остановлен.")
+        self.session_error = str(error)
+        self.cancel()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def checkpoint_wait(self):
+        """Ждет снятия паузы и прерывает работу, если обход отменен."""
+        self._running.wait()
+        if self.cancelled:
+            raise CrawlCancelled()
+
+    def count_response(self, response, *args, **kwargs):
+        """Хук сессии: считает запросы, повторы urllib3 и коды ответов."""
+        self.metrics.incr("requests")
+        self.metrics.incr(f"responses_{response.status_code // 100}xx")
+        retries = getattr(response.raw, "retries", None)
+        if retries is not None and retries.history:
+            self.metrics.incr("retries", len(retries.history))
+
+    def export_metrics(self, final=False):
+        """Выгружает метрики в Prometheus-файл (периодически) и, в конце обхода, в JSON-сводку."""
+        if self.cache:
+            self.metrics.set_counter("cache_hits", self.cache.hits)
+            self.metrics.set_counter("cache_misses", self.cache.misses)
+        self.metrics.set_counter("file_info_hits", self.file_info.hits)
+        self.metrics.set_counter("file_info_misses", self.file_info.misses)
+        self.metrics.set_counter("threads_done", self.stats["threads_done"])
+        self.metrics.set_counter("pages_done", self.stats["pages_done"])
+        self.metrics.export(force=final)
+        if final:
+            self.metrics.write_json(self.metrics_path)
+
+    @timed("get_page_content")
     def get_page_content(self, url):
         """Запрашивает HTML-код страницы с обработкой ошибок."""
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            return response.text
+            return self.fetch_text(url, timeout=self.timeout)
+        except SessionExpired as e:
+            self.session_expired(e)
         except requests.exceptions.Timeout:
             logging.error(f"⏳ Таймаут при загрузке {url}")
         except requests.exceptions.RequestException as e:
             logging.error(f"❌ Ошибка сети {url}: {e}")
         return None
 
-    def find_thread_links(self, html):
+    def fetch_text(self, url, **kwargs):
+        """Выполняет GET и возвращает текст ответа, используя кэш с условными запросами, если он включен."""
+        if self.cache:
+            return self.cache.fetch(self.session, url, **kwargs)
+
+        response = self.session.get(url, **kwargs)
+        response.raise_for_status()
+        return response.text
+
+    def get_page(self, url):
+        """Загружает страницу и разбирает ее один раз для всех извлекающих функций.
+
+        В дерево попадают только фрагменты, которые читает парсер (если не включен full_pages);
+        текст страницы освобождается сразу после разбора.
+        """
+        html = self.get_page_content(url)
+        if not html:
+            return None
+        if not self.measure_memory:
+            return HtmlPage(html, url, parse_only=self.page_strainer)
+        # Пик памяти страницы — ее текст плюс все, что выделено при разборе
+        with self.metrics.memory_peak("page", sys.getsizeof(html)):
+            return HtmlPage(html, url, parse_only=self.page_strainer)
+
+    @timed("find_thread_links")
+    def find_thread_items(self, page):
+        """Находит темы в списке: (ссылка, отметка последнего ответа или None)."""
+        items = []
+        for div in HtmlPage.of(page).find_all("div", class_="structItem-title"):
+            if a := div.find("a", href=True):
+                item = div.find_parent("div", class_="structItem")
+                items.append((self.base_url + a["href"].split("/unread")[0],
+                              self.find_last_post(item) if item else None))
+        return items
+
+    def find_thread_links(self, page):
         """Находит ссылки на темы."""
-        soup = BeautifulSoup(html, "html.parser")
-        return [
-            self.base_url + a["href"].split("/unread")[0]
-            for div in soup.find_all("div", class_="structItem-title")
-            if (a := div.find("a", href=True))
-        ]
+        return [url for url, _ in self.find_thread_items(page)]
+
+    @staticmethod
+    def find_last_post(item):
+        """Отметка последнего ответа темы в списке: дата последнего сообщения, иначе число ответов."""
+        latest = item.select_one("time.structItem-latestDate")
+        if latest and (value := latest.get("data-time") or latest.get("datetime")):
+            return value
+        replies = item.select_one(".structItem-cell--meta dd")
+        return replies.get_text(strip=True) if replies else None
+
+    def find_page_count(self, page):
+        """Находит количество страниц по навигации (1, если навигации нет)."""
+        numbers = [int(a.get_text(strip=True)) for a in HtmlPage.of(page).select(".pageNav-main li a")
+                   if a.get_text(strip=True).isdigit()]
+        return max(numbers, default=1)
+
+    def find_next_page_url(self, page):
+        """Находит ссылку на следующую страницу списка."""
+        next_page = HtmlPage.of(page).select_one("a.pageNav-jump--next")
+        return self.base_url + next_page["href"] if next_page else None
 
     def extract_thread_id(self, thread_url):
         """Извлекает ID темы из URL."""
         match = re.search(r"/threads/([^/]+)(?:/|$)", thread_url)
         return match.group(1) if match else None
 
-    def extract_articles(self, html):
+    @timed("extract_articles")
+    def extract_articles(self, page):
         """Извлекает статьи из темы."""
-
-        soup = BeautifulSoup(html, "html.parser")
-
-        container = soup.find("div", class_="block-body js-replyNewMessageContainer")
+        container = HtmlPage.of(page).find("div", class_="block-body js-replyNewMessageContainer")
 
         if not container:
             return []
@@ -60,46 +289,69 @@ class Parser:
 
     def parse_thread(self, thread_url):
         """Парсит страницу темы и извлекает данные."""
-        html = self.get_page_content(thread_url)
-        if not html:
+        page = self.get_page(thread_url)
+        if not page:
             return None
-        articles = self.extract_articles(html)
-
-        titles, authors, texts = [], [], []
-
-        for article in articles:
-            author = article.find("a", class_="username")
-            description = article.find("div", class_="bbCodeBlock-expandContent") or article.find("div",
-                                                                                                  class_="bbWrapper")
-
-            author = author.get_text(strip=True) if author else "Автор не найден"
-            text = description.get_text("\n", strip=True) if description else "Текст не найден"
-
-            authors.append(author)
-            texts.append(text)
 
-        # Сбор ссылок на вложенные файлы
-
-        soup = BeautifulSoup(html, "html.parser")
-        attachments = [
-            {"name": link["title"], "url": link["href"]}
-            for link in soup.select("ul.attachmentList a[href]")
-            if link.get("title")
-        ]
-
-        # Поиск кнопки "Скачать"
-        download_button = soup.select_one(".p-title-pageAction a.button--cta")
-        if download_button and (download_url := download_button.get("href")):
+        # Со страниц берутся только строки, а дерево каждой освобождается сразу после разбора,
+        # так что даже у огромной темы в памяти одновременно не больше нескольких деревьев
+        title_tag = page.select_one(".p-title .p-title-value")
+        title = title_tag.text.strip() if title_tag else ""
+        download_button = page.select_one(".p-title-pageAction a.button--cta")
+        download_url = download_button.get("href") if download_button else None
+        page_count = self.find_page_count(page)
+        contents = [self.extract_thread_page(page)]
+        del page, title_tag, download_button
+
+        # Остальные страницы темы загружаются параллельно, сообщения объединяются по порядку страниц.
+        # Тема без какой-либо из страниц не записывается, чтобы не отметить ее обработанной: иначе
+        # следующие запуски не увидят в ней изменений и сообщения этой страницы будут потеряны
+        if (other_pages := self.get_thread_pages(thread_url, page_count)) is None:
+            return None
+        contents += other_pages
+
+        authors, texts, attachments = [], [], []
+        attachment_urls = set()
+        for page_authors, page_texts, page_attachments in contents:
+            authors += page_authors
+            texts += page_texts
+
+            # Одно вложение может встречаться на разных страницах
+            for attachment in page_attachments:
+                if attachment["url"] not in attachment_urls:
+                    attachment_urls.add(attachment["url"])
+                    attachments.append(attachment)
+
+        # Кнопка "Скачать"
+        if download_url:
             attachments.append({"name": "", "url": download_url})
 
         new_attachments = []
         for attachment in attachments:
+            # Ссылка уже есть в отчете — это скачанный файл, повторно проверять его не нужно
+            if self.report.has_file(attachment["url"]):
+                new_attachments.append({"name": attachment["name"], "url": attachment["url"]})
+                continue
+
             global_file_url = urljoin(self.base_url, attachment["url"])
-            response = self.session.get(global_file_url, stream=True)
-            response.raise_for_status()
 
-            # Проверка Content-Type и Content-Disposition для различия файлов и HTML-страниц
-            content_type = response.headers.get("Content-Type", "")
+            # Страница загрузок уже разобрана (в этом или прошлом запуске) — проверять ссылку не нужно
+            if (file_info := self.file_info.lookup(global_file_url)) is not None:
+                new_attachments.extend(file_info)
+                continue
+
+            # Проверка Content-Type для различия файлов и HTML-страниц
+            try:
+                content_type = self.probe_attachment(global_file_url).get("Content-Type", "")
+            except SessionExpired:
+                raise
+            except requests.RequestException as e:
+                # Битая ссылка не должна стоить всей темы: вложение уходит в очередь непроверенным,
+                # перед скачиванием оно будет проверено снова (это может быть и страница загрузок),
+                # а при новой ошибке получит статус «Ошибка» и повторится при следующем запуске
+                logging.error(f"❌ Не удалось проверить вложение {global_file_url}: {e}")
+                self.metrics.incr("probes_failed")
+                content_type = ""
 
             if "text/html" in content_type:
                 file_info = self.get_file_info(global_file_url)
@@ -110,10 +362,7 @@ class Parser:
 
         attachments = new_attachments
 
-        title_tag = soup.select_one(".p-title .p-title-value")
-        title = title_tag.text.strip() if title_tag else ""
-
-        dir_name = re.sub(r'[\\/|?&"<>* :]', '_', title)
+        dir_name = thread_dir_name(title)
 
         return {
             "title": title,
@@ -124,112 +373,460 @@ class Parser:
             "thread_url": thread_url,
         }
 
+    def extract_thread_page(self, page):
+        """Извлекает со страницы темы авторов, тексты сообщений и вложения {name, url}."""
+        authors, texts = [], []
+        for article in self.extract_articles(page):
+            author = article.find("a", class_="username")
+            description = article.find("div", class_="bbCodeBlock-expandContent") or article.find("div",
+                                                                                                  class_="bbWrapper")
+
+            authors.append(author.get_text(strip=True) if author else "Автор не найден")
+            texts.append(description.get_text("\n", strip=True) if description else "Текст не найден")
+
+        # Сбор ссылок на вложенные файлы
+        attachments = [{"name": link["title"], "url": link["href"]}
+                       for link in page.select("ul.attachmentList a[href]") if link.get("title")]
+        return authors, texts, attachments
+
+    def get_thread_page(self, page_url):
+        """Загружает страницу темы и сразу извлекает из нее данные (None, если не загрузилась)."""
+        page = self.get_page(page_url)
+        return self.extract_thread_page(page) if page else None
+
+    def get_thread_pages(self, thread_url, page_count):
+        """Загружает и разбирает страницы темы со 2-й по page_count (параллельно, если включено несколько потоков).
+
+        Возвращает данные страниц в порядке их номеров (см. extract_thread_page) или None,
+        если какая-то страница не загрузилась.
+        """
+        page_urls = [f"{thread_url.rstrip('/')}/page-{number}" for number in range(2, page_count + 1)]
+        if self.workers > 1 and len(page_urls) > 1:
+            with self._page_pool_lock:
+                if not self._page_pool:
+                    self._page_pool = ThreadPoolExecutor(max_workers=self.workers)
+                page_pool = self._page_pool
+            pages = list(page_pool.map(self.get_thread_page, page_urls))
+        else:
+            pages = [self.get_thread_page(page_url) for page_url in page_urls]
+
+        failed = [page_url for page_url, page in zip(page_urls, pages) if not page]
+        if failed:
+            logging.error(f"❌ Страницы темы не загружены: {', '.join(failed)}; тема будет обработана "
+                          f"при следующем запуске.")
+            return None
+        return pages
+
+    def cached_probe(self, file_url):
+        """Заголовки уже проверенного вложения или None."""
+        with self._probe_lock:
+            headers = self._probe_cache.get(file_url)
+            if headers is not None:
+                self._probe_cache.move_to_end(file_url)
+            return headers
+
+    def forget_probe(self, file_url):
+        with self._probe_lock:
+            self._probe_cache.pop(file_url, None)
+
+    def known_size(self, file_url):
+        """Размер вложения по заголовкам его проверки (None, если он неизвестен)."""
+        length = (self.cached_probe(file_url) or {}).get("Content-Length", "")
+        return int(length) if length.isdigit() else None
+
+    def probe_attachment(self, file_url):
+        """Возвращает заголовки ответа по ссылке на вложение, не скачивая тело (HEAD, с кэшем)."""
+        if (headers := self.cached_probe(file_url)) is not None:
+            return headers
+
+        response = self.session.head(file_url, allow_redirects=True, timeout=self.timeout)
+        if response.status_code in (405, 501):
+            # Сервер не поддерживает HEAD — читаем только заголовки GET и сразу закрываем соединение
+            with self.session.get(file_url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+        else:
+            response.raise_for_status()
+
+        headers = CaseInsensitiveDict({name: response.headers[name] for name in PROBE_HEADERS
+                                       if name in response.headers})
+        with self._probe_lock:
+            self._probe_cache[file_url] = headers
+            while len(self._probe_cache) > PROBE_CACHE_ENTRIES:
+                self._probe_cache.popitem(last=False)
+        return headers
+
     def parse_forum(self):
-        """Парсит все страницы форума и сохраняет данные."""
-        page_number = 1
-        results = []
+        """Генератор: обходит все страницы форума, сохраняет данные и отдает темы по мере готовности."""
         forum_url = self.main_url
+        if not self.incremental and self.checkpoint.next_page_url:
+            forum_url = self.checkpoint.next_page_url
+            print(f"▶️ Продолжаем с сохраненной страницы: {forum_url}")
+        else:
+            self.checkpoint.restart()
+
+        # Все ответы сессии (включая перенаправления) учитываются в счетчиках запросов и повторов
+        if self.count_response not in self.session.hooks["response"]:
+            self.session.hooks["response"].append(self.count_response)
+
+        if self.measure_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._traces_memory = True
+
+        # Файлы, не скачанные в прошлый раз, ставятся в очередь до новых
+        self.downloads.start()
+        self.requeue_pending()
+
+        finished = False
+        try:
+            if self.workers == 1:
+                yield from self.crawl_sequential(forum_url)
+            else:
+                yield from CrawlPipeline(self).run(forum_url)
+            # Разбор закончен, дожидаемся файлов из очереди скачивания
+            self.downloads.join()
+            finished = True
+        except CrawlCancelled:
+            finished = True
+        finally:
+            if not finished:
+                # Генератор закрыт досрочно или упал — текущие скачивания тоже прерываем
+                self.cancel()
+            self.downloads.stop()
+            # Выгружаем отчет и при ошибке, чтобы не потерять обработанные темы
+            self.close()
+
+        if self.session_error:
+            print(f"⛔ Обход остановлен: {self.session_error}")
+        elif self.cancelled:
+            print("⏹️ Обход отменен пользователем.")
+        print(f"Парсинг завершен. Обработано {self.stats['pages_done']} страниц, "
+              f"найдено {self.stats['threads_done']} тем.")
+
+    def iter_listing(self, forum_url):
+        """Обходит страницы списка; отдает (URL страницы, ссылки на новые и обновленные темы, URL следующей)."""
         while forum_url:
-            html = self.get_page_content(forum_url)
-            if not html:
+            self.checkpoint_wait()
+            page = self.get_page(forum_url)
+            if not page:
                 logging.error(f"Не удалось загрузить {forum_url}.")
-                break
+                return
 
-            thread_links = self.find_thread_links(html)
-            for thread_url in thread_links:
-                if thread_data := self.parse_thread(thread_url):
-                    results.append(thread_data)
-                    self.save_thread_data(thread_data)
+            with self._stats_lock:
+                self.stats["total_pages"] = max(self.stats["total_pages"], self.find_page_count(page))
+
+            # Темы, обработанные в прошлых запусках, пропускаем, если в них не появилось новых ответов
+            thread_items = self.find_thread_items(page)
+            new_links = []
+            for url, last_post in thread_items:
+                if self.checkpoint.thread_changed(self.extract_thread_id(url), last_post):
+                    self._listing_markers[url] = last_post
+                    new_links.append(url)
 
             # Переход на следующую страницу
-            soup = BeautifulSoup(html, "html.parser")
-            next_page = soup.select_one("a.pageNav-jump--next")
-            forum_url = self.base_url + next_page["href"] if next_page else None
-            page_number += 1
+            forum_url = self.find_next_page_url(page)
+            if self.incremental and thread_items and not new_links:
+                print(f"⏹️ На странице {page.url} нет новых или обновленных тем, обход остановлен.")
+                forum_url = None
 
-        print(f"Парсинг завершен. Обработано {page_number - 1} страниц, найдено {len(results)} тем.")
-        return results
+            yield page.url, new_links, forum_url
 
-    def save_thread_data(self, data):
-        """Сохраняет данные темы: файлы, текст, отчет в Excel."""
-        thread_folder = os.path.join(self.save_path, data["dir_name"])
-        os.makedirs(thread_folder, exist_ok=True)
+    def crawl_sequential(self, forum_url):
+        """Последовательный обход: одна тема за другой в вызывающем потоке."""
+        for page_url, thread_links, next_page_url in self.iter_listing(forum_url):
+            for thread_url in thread_links:
+                self.checkpoint_wait()
+                if thread_data := self.fetch_thread(thread_url):
+                    yield self.write_thread(thread_data)
+
+            # Отмененная страница остается в контрольной точке незавершенной
+            self.checkpoint_wait()
+            self.page_finished(page_url, next_page_url)
+
+    def thread_finished(self, data):
+        """Учитывает сохраненную тему в счетчиках и сообщает о ней слушателю."""
+        self.add_stat("threads_done")
+        self.emit("thread", data=data, stats=dict(self.stats))
+        self.export_metrics()
+        return data
+
+    def page_finished(self, page_url, next_page_url):
+        """Отмечает страницу списка обработанной в контрольной точке и сообщает о ней слушателю."""
+        self.checkpoint.page_done(next_page_url)
+        self.add_stat("pages_done")
+        self.emit("page", url=page_url, stats=dict(self.stats))
+
+    def fetch_thread(self, thread_url):
+        """Парсит тему, не прерывая обработку остальных тем при ошибке (None — тема не разобрана)."""
+        try:
+            self.checkpoint_wait()
+            return self.parse_thread(thread_url)
+        except CrawlCancelled:
+            return None
+        except SessionExpired as e:
+            self.session_expired(e)
+            return None
+        except Exception:
+            logging.exception(f"❌ Ошибка обработки темы {thread_url}")
+            return None
+
+    def write_thread(self, data):
+        """Сохраняет разобранную тему (вызывается в порядке тем): текст, строки отчета и очередь скачивания."""
+        thread_folder = self.get_thread_folder(data)
 
         # 1️⃣ Сохранение текстового файла с описанием
         self.save_text_file(data, thread_folder)
 
-        # 2️⃣ Поиск и скачивание вложенных файлов
-        self.download_attachments(data, thread_folder)
-
-        # 3️⃣ Добавление в `report.xlsx`
+        # 2️⃣ Отбор новых файлов и добавление их в отчет со статусом «В очереди»
+        downloads = self.select_downloads(data)
         self.update_report(data)
 
+        # 3️⃣ Скачивание идет в отдельных потоках, разбор следующих тем не ждет его
+        self.downloads.submit(downloads, thread_folder)
+        return self.thread_finished(data)
+
+    def get_thread_folder(self, data):
+        """Создает (при необходимости) и возвращает папку темы."""
+        thread_folder = os.path.join(self.save_path, data["dir_name"])
+        os.makedirs(thread_folder, exist_ok=True)
+        return thread_folder
+
     def save_text_file(self, data, thread_folder):
-        """Сохраняет текстовый файл с описанием темы, избегая дубликатов."""
+        """Дописывает в текстовый файл темы только сообщения, которых в нем еще нет."""
         txt_path = os.path.join(thread_folder, f"{data['dir_name']}.txt")
 
         # Нормализация ссылки на тему (убираем завершающий слеш)
         normalized_url = data['thread_url'].rstrip('/')
 
-        new_entries = []
+        post_index = PostIndex(thread_folder, txt_path)
+        new_entries, new_keys = [], []
 
-        # Формируем новые записи и объединяем их в единую строку
+        # Формируем записи для сообщений, хэшей которых нет в индексе
         for author, text in zip(data["author"], data["br_text"]):
             normalized_text = text.strip()  # Убираем лишние пробелы и пустые строки
+            key = post_key(normalized_url, author, normalized_text)
+            if key in post_index or key in new_keys:
+                continue
             entry = f"Ссылка на тему: {normalized_url}\nНазвание: {data['title']}\nАвтор: {author}\nОписание:\n{normalized_text}\n"
             new_entries.append(entry)
+            new_keys.append(key)
 
-        new_content = "".join(new_entries)  # Превращаем новые записи в единую строку
-
-        # Читаем весь файл в строку
-        existing_content = ""
-        if os.path.exists(txt_path):
-            with open(txt_path, "r", encoding="utf-8") as f:
-                existing_content = f.read()
-
-        if new_content not in existing_content:
+        if new_entries:
             with open(txt_path, "a", encoding="utf-8") as f:
-                f.write(new_content)
+                f.write("".join(new_entries))
                 f.write("\n" * 5)
-            print(f"✅ Текстовый файл с описанием сохранен: {txt_path}")
+            post_index.add(new_keys)
+            print(f"✅ Текстовый файл с описанием сохранен: {txt_path} (новых сообщений: {len(new_entries)})")
         else:
             print(f"⚠️ Запись уже существует, файл пропущен: {txt_path}")
 
-    def download_attachments(self, data, thread_folder):
-        """Загружает все вложенные файлы в тему."""
+    def select_downloads(self, data):
+        """Отбирает вложения, которых еще нет в отчете."""
+        downloads, selected_urls = [], set()
         for attachment in data["attachments"]:
-            global_file_url = urljoin(self.base_url, attachment["url"])
-            file_name = attachment["name"]
-
-            try:
-                if not self.check_file_url_exists(attachment["url"]):
-                    self.download_file(global_file_url, thread_folder, file_name)
-                else:
-                    print(attachment["name"],"пропущен")
-            except requests.RequestException as e:
-                logging.error(f"❌ Ошибка скачивания {global_file_url}: {e}")
+            if self.check_file_url_exists(attachment["url"]) or attachment["url"] in selected_urls:
+                print(attachment["name"], "пропущен")
+                continue
+            selected_urls.add(attachment["url"])
+            downloads.append(attachment)
+        return downloads
+
+    def requeue_pending(self):
+        """Ставит в очередь файлы, не скачанные в прошлых запусках (отменены или завершились ошибкой)."""
+        rows = self.report.pending_rows()
+        for file_url, title, file_name in rows:
+            thread_folder = os.path.join(self.save_path, thread_dir_name(title or ""))
+            os.makedirs(thread_folder, exist_ok=True)
+            self.downloads.submit([{"name": file_name or "", "url": file_url}], thread_folder, wait=False)
+        if rows:
+            print(f"↪️ В очередь скачивания возвращено файлов из прошлых запусков: {len(rows)}")
+
+    def download_queued(self, attachment, thread_folder):
+        """Скачивает файл из очереди и отмечает результат в отчете (вызывается потоками DownloadScheduler)."""
+        global_file_url = urljoin(self.base_url, attachment["url"])
+        try:
+            self.checkpoint_wait()
+            if self.resolve_download_page(attachment, global_file_url, thread_folder):
+                return
+            entry = self.download_file(global_file_url, thread_folder, attachment["name"])
+        except CrawlCancelled:
+            return  # Строка остается «В очереди» и файл будет скачан при следующем запуске
+        except SessionExpired as e:
+            self.session_expired(e)
+            return
+        except (requests.RequestException, OSError) as e:
+            logging.error(f"❌ Ошибка скачивания {global_file_url}: {e}")
+            self.report.set_status(attachment["url"], STATUS_FAILED)
+            self.metrics.incr("downloads_failed")
+            return
+        finally:
+            # Заголовки проверки нужны только до скачивания файла
+            self.forget_probe(global_file_url)
 
-    def download_file(self, global_file_url, thread_folder, file_name=""):
-        """Скачивает файл по ссылке и сохраняет его на диск."""
+        if entry:
+            self.report.set_status(attachment["url"], STATUS_DONE, entry["sha256"], entry["size"])
+            self.metrics.incr("downloads_done")
+        else:
+            self.report.set_status(attachment["url"], STATUS_SKIPPED)
 
-        response = self.session.get(global_file_url, stream=True)
-        response.raise_for_status()
+    def resolve_download_page(self, attachment, global_file_url, thread_folder):
+        """Проверяет вложение, у которого нет заголовков проверки, и разворачивает страницу загрузок.
 
-        # Получаем корректное имя файла
-        file_name = self.get_filename_from_headers(response.headers, global_file_url, file_name)
+        Такое вложение не удалось проверить при разборе темы (или оно осталось с прошлого запуска).
+        Если по ссылке страница загрузок, ее файлы добавляются в отчет и очередь вместо нее, а сама
+        строка получает статус «Пропущен». Возвращает True, если ссылка оказалась страницей загрузок.
+        """
+        if self.cached_probe(global_file_url) is not None or self.store.lookup(global_file_url):
+            return False
+        if "text/html" not in self.probe_attachment(global_file_url).get("Content-Type", ""):
+            return False
 
-        if file_name == "reply":
+        file_info = self.get_file_info(global_file_url)
+        title, thread_url = self.report.attachment_thread(attachment["url"])
+        files = []
+        with self.database.transaction():
+            for file in file_info:
+                if self.report.add_row(STATUS_QUEUED, title, thread_url, file["url"], file["name"]):
+                    files.append(file)
+            self.report.set_status(attachment["url"], STATUS_SKIPPED)
+        print(f"📄 {global_file_url} — страница загрузок, файлов в очередь: {len(files)}")
+        # Поток скачивания не может ждать места в очереди, которую разбирает сам
+        self.downloads.submit(files, thread_folder, wait=False)
+        return True
+
+    @timed("download_file")
+    def download_file(self, global_file_url, thread_folder, file_name=""):
+        """Скачивает файл по ссылке в хранилище и создает на него ссылку в папке темы.
+
+        Возвращает запись хранилища о файле или None, если файл пропущен.
+        """
+        if (headers := self.cached_probe(global_file_url)) is not None:
+            # Имя файла известно из проверки вложения — запрос не нужен, если файл пропускается
+            if self.get_filename_from_headers(headers, global_file_url, file_name) == "reply":
+                print(f"⚠️ Пропущен файл с именем 'reply': {global_file_url}")
+                return None
+
+        # Файл по этой ссылке уже скачан (например, в другой теме) — достаточно ссылки на него
+        if entry := self.store.lookup(global_file_url):
+            file_name = file_name or entry["name"]
+            file_path = self.place_file(entry["sha256"], thread_folder, file_name)
+            print(f"♻️ Файл {file_name} уже есть в хранилище, ссылка создана: {file_path}")
+            return entry
+
+        deadline = time.monotonic() + self.download_timeout
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            try:
+                result = self.download_part(global_file_url, file_name, deadline)
+                break
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                    IncompleteDownload) as e:
+                # Обрыв посреди файла: .part сохраняется, следующая попытка докачает его с Range
+                if attempt == DOWNLOAD_ATTEMPTS:
+                    raise
+                logging.warning(f"⚠️ Обрыв скачивания {global_file_url} ({e}), попытка {attempt + 1}")
+
+        if result is None:
             print(f"⚠️ Пропущен файл с именем 'reply': {global_file_url}")
-            return
-
-        file_path = os.path.join(thread_folder, file_name)
-        file_path = self.ensure_unique_file_path(file_path)
-
-        with open(file_path, "wb") as f:
-            for chunk in response.iter_content(1024):
-                f.write(chunk)
+            return None
 
+        file_name, part_path, sha256, size = result
+        entry = self.store.add(global_file_url, part_path, sha256, size, file_name)
+        file_path = self.place_file(entry["sha256"], thread_folder, file_name)
         print(f"✅ Файл {file_name} скачан и сохранен в {file_path}")
+        return entry
+
+    def download_part(self, global_file_url, file_name, deadline):
+        """Скачивает (или докачивает) файл в .part хранилища и проверяет его размер.
+
+        Возвращает (имя файла, путь к .part, sha256, размер) или None, если файл нужно пропустить.
+        """
+        part_path = self.store.part_path(global_file_url)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with self.session.get(global_file_url, stream=True, timeout=self.timeout, headers=headers) as response:
+            if response.status_code == 416:
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                if total.isdigit() and int(total) == offset:
+                    # .part уже содержит файл целиком (обрыв случился после последнего байта) — докачивать нечего
+                    file_name = self.get_filename_from_headers(self.cached_probe(global_file_url) or {},
+                                                               global_file_url, file_name)
+                    if file_name == "reply":
+                        return None
+                    digest = hashlib.sha256()
+                    self.update_digest(digest, part_path)
+                    return file_name, part_path, digest.hexdigest(), offset
+                # Сохраненный кусок не подходит к файлу на сервере — начинаем заново
+                os.remove(part_path)
+                raise IncompleteDownload("сервер отклонил докачку")
+            response.raise_for_status()
+            if "text/html" in response.headers.get("Content-Type", ""):
+                # Страница загрузок или входа на сайт не должна сохраниться как файл со статусом «Скачан»
+                raise UnexpectedPage(f"вместо файла получена HTML-страница: {global_file_url}")
+
+            # Получаем корректное имя файла
+            file_name = self.get_filename_from_headers(response.headers, global_file_url, file_name)
+
+            if file_name == "reply":
+                return None
+
+            if response.status_code != 206:
+                offset = 0  # Сервер не поддержал Range и отдает файл целиком
+            expected_size = self.get_expected_size(response, offset)
+
+            # Хэш считается во время скачивания; при докачке сначала учитываем уже скачанную часть
+            digest = hashlib.sha256()
+            if offset:
+                print(f"↪️ Докачка {file_name} с {offset} байт")
+                self.update_digest(digest, part_path)
+
+            with open(part_path, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(self.chunk_size):
+                    self.downloads.throttle(len(chunk))
+                    f.write(chunk)
+                    digest.update(chunk)
+                    self.add_stat("bytes_downloaded", len(chunk))
+                    self.metrics.incr("bytes_downloaded", len(chunk))
+                    # Пауза действует между файлами, чтобы не держать открытое соединение
+                    if self.cancelled:
+                        raise CrawlCancelled()
+                    if time.monotonic() > deadline:
+                        raise requests.exceptions.Timeout(
+                            f"Файл не скачан за {self.download_timeout} с: {global_file_url}")
+
+        size = os.path.getsize(part_path)
+        if expected_size is not None and size != expected_size:
+            if size > expected_size:
+                os.remove(part_path)  # Кусок больше файла — он испорчен, докачивать нечего
+            raise IncompleteDownload(f"получено {size} байт из {expected_size}")
+        return file_name, part_path, digest.hexdigest(), size
+
+    def update_digest(self, digest, path):
+        """Добавляет к хэшу содержимое уже скачанной части файла."""
+        with open(path, "rb") as f:
+            while block := f.read(self.chunk_size):
+                digest.update(block)
+
+    @staticmethod
+    def get_expected_size(response, offset):
+        """Полный размер файла по Content-Range / Content-Length (None, если его нельзя проверить)."""
+        if response.headers.get("Content-Encoding", "identity") != "identity":
+            return None  # Content-Length указан для сжатых данных
+        if response.status_code == 206:
+            content_range = response.headers.get("Content-Range", "")
+            total = content_range.rpartition("/")[2]
+            return int(total) if total.isdigit() else None
+        length = response.headers.get("Content-Length")
+        return offset + int(length) if length and length.isdigit() else None
+
+    def place_file(self, sha256, thread_folder, file_name):
+        """Создает в папке темы ссылку на файл хранилища, не дублируя уже связанный файл."""
+        file_path = os.path.join(thread_folder, file_name)
+        with self._fs_lock:
+            if self.store.is_same_file(sha256, file_path):
+                return file_path
+            file_path = self.ensure_unique_file_path(file_path)
+            self.store.link(sha256, file_path)
+        return file_path
 
     def get_filename_from_headers(self, headers, file_url, file_name):
         """Извлекает имя файла из заголовков или URL, поддерживая кириллицу."""
@@ -263,88 +860,82 @@ class Parser:
             counter += 1
         return file_path
 
+    @timed("check_file_url_exists")
     def check_file_url_exists(self, file_url):
         """Метод для проверки, существует ли ссылка на файл в отчете."""
-        if os.path.exists(self.excel_path):
-            df = pd.read_excel(self.excel_path)
-        else:
-            df = pd.DataFrame(
-                columns=["№", "Статус", "Название темы", "Ссылка на тему", "Ссылка на файл", "Название файла"])
-
-        # Проверяем, существует ли file_url в колонке "Ссылка на файл"
-        if file_url in df["Ссылка на файл"].values:
+        if self.report.has_file(file_url):
             print(f"Ссылка на файл {file_url} уже существует в отчете.")
             return True
         else:
             return False
 
+    @timed("update_report")
     def update_report(self, data):
-        """Обновляет отчет в Excel."""
-
-        df = pd.read_excel(self.excel_path) if os.path.exists(self.excel_path) else pd.DataFrame(
-            columns=["№", "Статус", "Название темы", "Ссылка на тему", "Ссылка на файл", "Название файла"]
-        )
-        for attachment in data["attachments"]:
-            if not self.check_file_url_exists(attachment["url"]):
-                df = pd.concat([df, pd.DataFrame([{
-                    "№": len(df) + 1,
-                    "Статус": "Скачан",
-                    "Название темы": data["title"],
-                    "Ссылка на тему": data["thread_url"],
-                    "Ссылка на файл": attachment["url"],
-                    "Название файла": attachment["name"]
-                }])], ignore_index=True)
-                print(f"📊 Отчет обновлен: {self.excel_path}")
-
-        df.to_excel(self.excel_path, index=False)
-
-        self.check_and_add_base_url()
-
-    def check_and_add_base_url(self):
-        config_sheet_name = "config"
-
-        if os.path.exists(self.excel_path):
-            workbook = openpyxl.load_workbook(self.excel_path)
-            # Проверяем, существует ли лист config, если нет - создаем его
-            if config_sheet_name not in workbook.sheetnames:
-                sheet = workbook.create_sheet(config_sheet_name)
-                # Записываем глобальный URL в первую ячейку
-                sheet.cell(row=1, column=1).value = self.main_url
-                sheet.sheet_state = "hidden"  # Скрываем лист
-            else:
-                sheet = workbook[config_sheet_name]
-                # Если URL не записан, добавляем его
-                if not sheet.cell(row=1, column=1).value:
-                    sheet.cell(row=1, column=1).value = self.main_url
-                    sheet.sheet_state = "hidden"  # Скрываем лист
-
-            workbook.save(self.excel_path)
-        else:
-            print("Файл отчета не найден!")
-
-    def get_file_info(self, page_url):
-        """Извлекает имя файла и ссылку для скачивания с HTML страницы."""
+        """Записывает вложения темы в базу отчета."""
+        # Строки отчета и отметка о теме пишутся одной транзакцией: тема не может оказаться
+        # обработанной без своих строк в отчете
+        with self.database.transaction():
+            for attachment in data["attachments"]:
+                # Статус сменится на «Скачан» (с хэшем и размером), когда файл будет скачан целиком
+                if self.report.add_row(STATUS_QUEUED, data["title"], data["thread_url"], attachment["url"],
+                                       attachment["name"]):
+                    print(f"📊 Отчет обновлен: {self.excel_path}")
+
+            self.checkpoint.add_thread(self.extract_thread_id(data["thread_url"]), data["thread_url"], data["title"],
+                                       self._listing_markers.pop(data["thread_url"], None))
+
+        if self.report.thread_done():
+            print(f"📊 Отчет выгружен: {self.excel_path}")
+            self.store.save_index()
+
+    def close(self):
+        """Записывает на диск все, что еще осталось в буферах, и закрывает базу состояния обхода."""
+        if self._closed:
+            return
+        self._closed = True
         try:
-            response = self.session.get(page_url)
-            response.raise_for_status()
+            with self._page_pool_lock:
+                if self._page_pool:
+                    self._page_pool.shutdown(wait=False)
+                    self._page_pool = None
+            with self.metrics.timer("report_export"):
+                self.report.export()
+            self.store.save_index()
+
+            if self.count_response in self.session.hooks["response"]:
+                self.session.hooks["response"].remove(self.count_response)
+            self.export_metrics(final=True)
+            if self._traces_memory:
+                tracemalloc.stop()
+                self._traces_memory = False
+        finally:
+            # Иначе соединение SQLite и файлы WAL остаются открытыми после каждого обхода
+            self.database.close()
 
-            soup = BeautifulSoup(response.text, "html.parser")
-            file_info = []
+    def get_file_info(self, page_url):
+        """Извлекает имя файла и ссылку для скачивания с HTML страницы (с кэшем по ссылке).
 
-            file_items = soup.select(".block-body .block-row")
+        Ошибка загрузки страницы (в том числе SessionExpired) передается вызывающему: тема без файлов
+        страницы загрузок не должна отмечаться обработанной.
+        """
+        return self.file_info.get(page_url, self.load_file_info)
 
-            for item in file_items:
-                file_name_tag = item.select_one(".contentRow-title")
-                file_link_tag = item.select_one(".contentRow-extra a")
+    @timed("load_file_info")
+    def load_file_info(self, page_url):
+        """Загружает и разбирает страницу загрузок."""
+        return self.extract_file_info(HtmlPage(self.fetch_text(page_url, timeout=self.timeout), page_url))
 
-                if file_name_tag and file_link_tag:
-                    file_name = file_name_tag.text.strip()
-                    file_url = urljoin(self.base_url, file_link_tag["href"])
+    def extract_file_info(self, page):
+        """Извлекает список файлов {name, url} из разобранной страницы загрузок."""
+        file_info = []
+        for item in page.select(".block-body .block-row"):
+            file_name_tag = item.select_one(".contentRow-title")
+            file_link_tag = item.select_one(".contentRow-extra a")
 
-                    file_info.append({"name": file_name, "url": file_url})
+            if file_name_tag and file_link_tag:
+                file_name = file_name_tag.text.strip()
+                file_url = urljoin(self.base_url, file_link_tag["href"])
 
-            return file_info
+                file_info.append({"name": file_name, "url": file_url})
 
-        except requests.RequestException as e:
-            print(f"Ошибка при получении страницы: {e}")
-            return []
+        return file_info
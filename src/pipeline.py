@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+
+STOP = object()  # Сигнал рабочему потоку завершиться
+POLL_INTERVAL = 0.1  # секунд между проверками остановки конвейера
+
+
+class CrawlPipeline:
+    """Потоковый конвейер обхода форума.
+
+    Стадии связаны ограниченными очередями:
+    страницы списка (1 поток) -> разбор тем (workers потоков) -> запись тем (поток, читающий run()).
+    Записываются темы строго в порядке ссылок на страницах: файлы, общие для нескольких тем,
+    достаются первой из них, поэтому результат совпадает с последовательным обходом.
+    Сами файлы скачивает DownloadScheduler парсера, параллельно с разбором следующих тем.
+    Число тем «в работе» ограничено max_in_flight, а очередь скачивания — окном DownloadScheduler
+    (запись темы ждет в ней места), так что память не растет с размером форума.
+    """
+
+    def __init__(self, parser, queue_size=None, max_in_flight=None):
+        self.parser = parser
+        self.workers = parser.workers
+        queue_size = queue_size or self.workers * 2
+        self.thread_queue = queue.Queue(maxsize=queue_size)
+        self.events = queue.Queue()  # Сообщения стадий для потока-потребителя
+        self.in_flight = threading.BoundedSemaphore(max_in_flight or self.workers * 4)
+        self.stopped = threading.Event()
+
+    def run(self, forum_url):
+        """Генератор данных тем в порядке их появления в списке."""
+        threads = [threading.Thread(target=self.produce_links, args=(forum_url,), daemon=True)]
+        threads += [threading.Thread(target=self.parse_worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        finished = False
+        try:
+            yield from self.consume()
+            finished = True
+        finally:
+            if not finished:
+                # Генератор закрыт досрочно или упал — прерываем и разбор оставшихся тем
+                self.parser.cancel()
+            self.stopped.set()
+            for thread in threads:
+                thread.join()
+
+    def put(self, target_queue, item):
+        """Кладет элемент в ограниченную очередь, ожидая места; False, если конвейер остановлен."""
+        while not self.stopped.is_set():
+            try:
+                target_queue.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, source_queue):
+        """Берет элемент из очереди; STOP, если конвейер остановлен."""
+        while not self.stopped.is_set():
+            try:
+                return source_queue.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return STOP
+
+    def acquire_slot(self):
+        while not self.stopped.is_set():
+            if self.in_flight.acquire(timeout=POLL_INTERVAL):
+                return True
+        return False
+
+    def produce_links(self, forum_url):
+        """Стадия 1: обходит страницы списка и отдает ссылки на темы."""
+        seq = 0
+        try:
+            for page_url, thread_links, next_page_url in self.parser.iter_listing(forum_url):
+                for thread_url in thread_links:
+                    if not self.acquire_slot() or not self.put(self.thread_queue, (seq, thread_url)):
+                        return
+                    seq += 1
+                # Страница завершена, когда записаны все темы с номерами меньше seq
+                self.events.put(("page", seq, (page_url, next_page_url)))
+        except Exception as e:
+            if not self.parser.cancelled:
+                logging.exception(f"❌ Ошибка обхода страниц списка: {e}")
+        finally:
+            self.events.put(("end", seq, None))
+            for _ in range(self.workers):
+                self.put(self.thread_queue, STOP)
+
+    def parse_worker(self):
+        """Стадия 2: разбирает темы."""
+        while (item := self.get(self.thread_queue)) is not STOP:
+            seq, thread_url = item
+            self.events.put(("parsed", seq, self.parser.fetch_thread(thread_url)))
+
+    def consume(self):
+        """Записывает разобранные темы по порядку и отмечает завершенные страницы."""
+        parsed = {}
+        pages = []
+        next_write = 0
+        total = None
+
+        while total is None or next_write < total:
+            kind, seq, payload = self.events.get()
+            if kind == "parsed":
+                parsed[seq] = payload
+            elif kind == "page":
+                pages.append((seq, payload))
+            elif kind == "end":
+                total = seq
+
+            while next_write in parsed:
+                if data := parsed.pop(next_write):
+                    yield self.parser.write_thread(data)
+                self.in_flight.release()
+                next_write += 1
+
+            while pages and pages[0][0] <= next_write:
+                _, (page_url, next_page_url) = pages.pop(0)
+                # Отмененная страница остается в контрольной точке незавершенной
+                if not self.parser.cancelled:
+                    self.parser.page_finished(page_url, next_page_url)
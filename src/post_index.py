@@ -0,0 +1,50 @@
+import hashlib
+import os
+import re
+
+POST_INDEX_FILE_NAME = ".posts_index"
+
+ENTRY_PATTERN = re.compile(
+    r"^Ссылка на тему: (?P<url>[^\n]*)\nНазвание: [^\n]*\nАвтор: (?P<author>[^\n]*)\nОписание:\n"
+    r"(?P<text>.*?)(?=^Ссылка на тему: |\Z)",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+def post_key(thread_url, author, text):
+    """Хэш сообщения по ссылке на тему, автору и нормализованному тексту."""
+    normalized_text = " ".join(text.split())
+    return hashlib.sha1(f"{thread_url}\0{author}\0{normalized_text}".encode("utf-8")).hexdigest()
+
+
+class PostIndex:
+    """Индекс хэшей сообщений, уже записанных в текстовый файл темы (файл .posts_index рядом с ним)."""
+
+    def __init__(self, thread_folder, txt_path):
+        self.path = os.path.join(thread_folder, POST_INDEX_FILE_NAME)
+        self.keys = set()
+
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="ascii") as f:
+                self.keys = {line.strip() for line in f if line.strip()}
+        elif os.path.exists(txt_path):
+            # Текст записан до появления индекса — строим индекс по нему один раз
+            self.add(self.keys_from_text(txt_path))
+
+    @staticmethod
+    def keys_from_text(txt_path):
+        with open(txt_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        return [post_key(match["url"], match["author"], match["text"]) for match in ENTRY_PATTERN.finditer(content)]
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def add(self, keys):
+        """Добавляет хэши в индекс и дописывает их в файл."""
+        new_keys = [key for key in keys if key not in self.keys]
+        if not new_keys:
+            return
+        self.keys.update(new_keys)
+        with open(self.path, "a", encoding="ascii") as f:
+            f.write("".join(f"{key}\n" for key in new_keys))
@@ -0,0 +1,209 @@
+import logging
+import os
+import threading
+import time
+
+import openpyxl
+
+from crawl_db import CrawlDatabase, CRAWL_DB_FILE_NAME
+
+REPORT_COLUMNS = ["№", "Статус", "Название темы", "Ссылка на тему", "Ссылка на файл", "Название файла"]
+REPORT_SHEET_NAME = "Sheet1"
+CONFIG_SHEET_NAME = "config"
+
+# Статусы строк отчета
+STATUS_QUEUED = "В очереди"
+STATUS_DONE = "Скачан"
+STATUS_FAILED = "Ошибка"
+STATUS_SKIPPED = "Пропущен"
+
+DEFAULT_EXPORT_INTERVAL = 300.0  # секунд между промежуточными выгрузками отчета во время обхода
+
+
+def get_base_url_and_directory(excel_path):
+    # Путь к папке, где находится файл
+    directory_path = os.path.dirname(excel_path)
+
+    if os.path.exists(excel_path):
+        # Загружаем рабочую книгу
+        workbook = openpyxl.load_workbook(excel_path, read_only=True)
+
+        # Проверяем, есть ли скрытый лист config
+        if "config" in workbook.sheetnames:
+            sheet = workbook["config"]
+
+            # Получаем глобальный URL из первой ячейки
+            base_url = next(sheet.iter_rows(max_row=1, max_col=1, values_only=True), (None,))[0]
+            workbook.close()
+
+            return base_url, directory_path
+        else:
+            workbook.close()
+            print("Лист 'config' не найден.")
+            return None, None
+
+    # Отчет мог не успеть выгрузиться (например, обход прервался) — URL есть в базе состояния
+    db_path = os.path.join(directory_path, CRAWL_DB_FILE_NAME)
+    if os.path.exists(db_path):
+        database = CrawlDatabase(db_path)
+        base_url = database.main_url
+        database.close()
+        if base_url:
+            return base_url, directory_path
+
+    print(f"Файл {excel_path} не найден.")
+    return None, None
+
+
+class ReportStore:
+    """Отчет report.xlsx как выгрузка из базы состояния обхода.
+
+    Проверки дубликатов и добавление строк идут в SQLite; сам файл Excel пересобирается из базы
+    потоковой записью (openpyxl write-only) по запросу, в конце обхода и изредка во время него.
+    """
+
+    def __init__(self, excel_path, database, export_interval=DEFAULT_EXPORT_INTERVAL):
+        """export_interval — как часто (в секундах) выгружать отчет во время обхода; None — только в конце."""
+        self.excel_path = excel_path
+        self.database = database
+        self.export_interval = export_interval
+        self.lock = threading.RLock()
+        self.dirty = False  # В базе есть изменения, которых нет в report.xlsx
+        self.last_export = time.monotonic()
+
+        if not self.database.get_meta("report_imported"):
+            if os.path.exists(self.excel_path):
+                self.import_excel()
+            else:
+                self.database.set_meta("report_imported", 1)
+
+    @property
+    def main_url(self):
+        return self.database.main_url
+
+    def __len__(self):
+        return self.database.count_attachments()
+
+    def import_excel(self):
+        """Переносит в базу строки report.xlsx, созданного до появления базы (один раз)."""
+        try:
+            workbook = openpyxl.load_workbook(self.excel_path, read_only=True)
+        except Exception as e:
+            logging.error(f"❌ Не удалось прочитать отчет {self.excel_path}: {e}")
+            return
+
+        imported = 0
+        with self.database.transaction():
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, ())
+            columns = {name: index for index, name in enumerate(header)}
+            for row in rows:
+                values = {name: row[index] if index < len(row) else None for name, index in columns.items()}
+                if values.get("Ссылка на файл") and self.database.add_attachment(
+                        values.get("Статус"), values.get("Название темы"), values.get("Ссылка на тему"),
+                        values["Ссылка на файл"], values.get("Название файла")):
+                    imported += 1
+
+            # Уже записанный URL форума сохраняем, как и раньше
+            if CONFIG_SHEET_NAME in workbook.sheetnames:
+                config = workbook[CONFIG_SHEET_NAME]
+                main_url = next(config.iter_rows(max_row=1, max_col=1, values_only=True), (None,))[0]
+                if main_url:
+                    self.database.set_meta("main_url", main_url)
+            self.database.set_meta("report_imported", 1)
+        workbook.close()
+        logging.info(f"📥 Из {self.excel_path} в базу перенесено строк: {imported}")
+
+    def has_file(self, file_url):
+        """Проверяет, есть ли ссылка на файл в отчете."""
+        return self.database.has_file(file_url)
+
+    def has_thread(self, thread_url):
+        """Проверяет, есть ли в отчете строки этой темы."""
+        return self.database.has_thread_url(thread_url)
+
+    def add_row(self, status, title, thread_url, file_url, file_name, sha256=None, size=None):
+        """Добавляет строку в отчет, если ссылки на файл в нем еще нет. Возвращает True при добавлении."""
+        added = self.database.add_attachment(status, title, thread_url, file_url, file_name, sha256, size)
+        if added:
+            self.dirty = True
+        return added
+
+    def set_status(self, file_url, status, sha256=None, size=None):
+        """Меняет статус строки отчета."""
+        self.database.set_status(file_url, status, sha256, size)
+        self.dirty = True
+
+    def attachment_thread(self, file_url):
+        """Название темы и ссылка на тему строки с этим файлом."""
+        return self.database.attachment_thread(file_url)
+
+    def pending_rows(self):
+        """Строки, файлы которых еще не скачаны (остались в очереди или скачались с ошибкой)."""
+        return self.database.attachments_with_status((STATUS_QUEUED, STATUS_FAILED))
+
+    def thread_done(self):
+        """Отмечает обработанную тему и выгружает отчет, если с прошлой выгрузки прошло export_interval.
+
+        Возвращает True, если отчет был выгружен.
+        """
+        with self.lock:
+            if self.export_interval is None or time.monotonic() - self.last_export < self.export_interval:
+                return False
+            self.export()
+            return True
+
+    def export(self, force=False):
+        """Пересобирает report.xlsx из базы: строки пишутся потоком, лист config скрыт.
+
+        Без force файл не трогается, если с прошлой выгрузки база не менялась.
+        """
+        with self.lock:
+            self.last_export = time.monotonic()
+            if not force and not self.dirty and os.path.exists(self.excel_path):
+                return
+            self.dirty = False
+
+            write_report(self.excel_path, self.database.iter_attachments(), self.main_url)
+
+
+def write_report(excel_path, rows, main_url):
+    """Потоково записывает report.xlsx: строки (статус, тема, ссылка на тему, ссылка на файл, имя файла)
+    с порядковыми номерами и скрытый лист config с URL форума."""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(REPORT_SHEET_NAME)
+    sheet.append(REPORT_COLUMNS)
+    for number, row in enumerate(rows, start=1):
+        sheet.append((number,) + tuple(row))
+
+    config = workbook.create_sheet(CONFIG_SHEET_NAME)
+    config.append([main_url])
+    config.sheet_state = "hidden"  # Скрываем лист
+
+    # Пишем во временный файл и подменяем отчет, чтобы сбой не оставил его битым
+    name, ext = os.path.splitext(excel_path)
+    tmp_path = f"{name}.tmp{ext}"
+    workbook.save(tmp_path)
+    os.replace(tmp_path, excel_path)
+
+
+def merge_reports(db_paths, excel_path):
+    """Собирает общий report.xlsx из баз нескольких разделов; файл, найденный в нескольких разделах,
+    попадает в отчет один раз (из первого раздела). Возвращает количество строк."""
+    seen_urls = set()
+
+    def rows():
+        for db_path in db_paths:
+            database = CrawlDatabase(db_path)
+            try:
+                for row in database.iter_attachments():
+                    if row[3] not in seen_urls:
+                        seen_urls.add(row[3])
+                        yield row
+            finally:
+                database.close()
+
+    # Общий отчет охватывает несколько разделов, поэтому URL форума в config не записывается:
+    # продолжать обход по нему нужно через отчеты разделов
+    write_report(excel_path, rows(), None)
+    return len(seen_urls)
@@ -1,36 +1,17 @@
 import logging
-import os
+import queue
+import threading
+import time
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, simpledialog
 from tkinter.ttk import Progressbar
 
-import openpyxl
+import auth
+from parser import Parser, DEFAULT_WORKERS
+from report import get_base_url_and_directory
 
-from parser import Parser
 
-
-def get_base_url_and_directory(excel_path):
-    if os.path.exists(excel_path):
-        # Загружаем рабочую книгу
-        workbook = openpyxl.load_workbook(excel_path)
-
-        # Проверяем, есть ли скрытый лист config
-        if "config" in workbook.sheetnames:
-            sheet = workbook["config"]
-
-            # Получаем глобальный URL из первой ячейки
-            base_url = sheet.cell(row=1, column=1).value
-
-            # Получаем путь к папке, где находится файл
-            directory_path = os.path.dirname(excel_path)
-
-            return base_url, directory_path
-        else:
-            print("Лист 'config' не найден.")
-            return None, None
-    else:
-        print(f"Файл {excel_path} не найден.")
-        return None, None
+POLL_INTERVAL_MS = 200
 
 
 class UrlInputPage:
@@ -44,8 +25,13 @@ class UrlInputPage:
         self.directory = None
         self.save_path = tk.StringVar()
         self.report_path = tk.StringVar()
+        self.workers = tk.IntVar(value=DEFAULT_WORKERS)
+        self.incremental = tk.BooleanVar(value=False)
 
         self.parser = None
+        self.worker = None
+        self.events = queue.Queue()
+        self.started_at = None
 
         self.create_ui()
 
@@ -70,16 +56,34 @@ class UrlInputPage:
         tk.Button(self.root, text="Выбрать", command=self.select_report_file).grid(row=2, column=2, padx=5, pady=5)
 
         # Кнопки управления
-        tk.Button(self.root, text="Парсить форум", command=self.parse_forum).grid(row=3, column=0, columnspan=3,
-                                                                                  pady=10)
+        self.parse_button = tk.Button(self.root, text="Парсить форум", command=self.parse_forum)
+        self.parse_button.grid(row=3, column=0, pady=10)
+        self.pause_button = tk.Button(self.root, text="Пауза", command=self.toggle_pause, state=tk.DISABLED)
+        self.pause_button.grid(row=3, column=1, pady=10)
+        self.cancel_button = tk.Button(self.root, text="Отмена", command=self.cancel_parsing, state=tk.DISABLED)
+        self.cancel_button.grid(row=3, column=2, pady=10)
+
+        # Строка состояния: страницы, темы, объем и скорость скачивания
+        self.status_label = tk.Label(self.root, text="")
+        self.status_label.grid(row=7, column=0, columnspan=3, padx=10, pady=5)
 
         # Поле для вывода результатов
         self.result_text = tk.Text(self.root, height=10, width=70)
         self.result_text.grid(row=5, column=0, columnspan=3, padx=10, pady=10)
 
-    def update_progress(self, value):
+        # Количество одновременно обрабатываемых тем
+        tk.Label(self.root, text="Количество потоков:").grid(row=6, column=0, padx=10, pady=5)
+        tk.Spinbox(self.root, from_=1, to=16, textvariable=self.workers, width=5).grid(row=6, column=1, sticky="w",
+                                                                                       padx=10, pady=5)
+
+        # Режим обновления: обойти только новые темы с начала форума
+        tk.Checkbutton(self.root, text="Только новые темы", variable=self.incremental).grid(row=6, column=2, padx=5,
+                                                                                            pady=5)
+
+    def update_progress(self, value, maximum=None):
+        if maximum:
+            self.progress["maximum"] = maximum
         self.progress["value"] = value
-        self.root.update_idletasks()
 
     def select_directory(self):
         """Выбор каталога для сохранения скачанных файлов."""
@@ -127,16 +131,112 @@ class UrlInputPage:
                 self.save_path.set(save_path)  # Обновляем поле пути
 
         # Создаём объект парсера
-        self.parser = Parser(self.session, url, save_path)
+        self.parser = Parser(self.session, url, save_path, workers=self.workers.get(),
+                             incremental=self.incremental.get(), listener=self.events.put)
         print(f"Запуск парсинга форума: {url}")
 
-        results = self.parser.parse_forum()
-
-        if results:
-            self.result_text.delete("1.0", tk.END)
-            for thread in results:
-                self.result_text.insert(tk.END, f"{thread['title']} - {thread['author']}\n")
-
-            messagebox.showinfo("Успех", f"Найдено {len(results)} тем.")
+        # Обход идет в фоновом потоке, окно получает события через очередь
+        self.result_text.delete("1.0", tk.END)
+        self.update_progress(0)
+        self.started_at = time.monotonic()
+        self.worker = threading.Thread(target=self.run_parser, args=(self.parser,), daemon=True)
+        self.worker.start()
+
+        self.parse_button.config(state=tk.DISABLED)
+        self.pause_button.config(state=tk.NORMAL, text="Пауза")
+        self.cancel_button.config(state=tk.NORMAL)
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def run_parser(self, parser):
+        """Выполняется в фоновом потоке: обходит форум и сообщает об окончании через очередь."""
+        try:
+            count = sum(1 for _ in parser.parse_forum())
+            self.events.put({"type": "finished", "count": count, "cancelled": parser.cancelled,
+                             "session_error": parser.session_error})
+        except Exception as e:
+            logging.exception("Ошибка парсинга")
+            self.events.put({"type": "error", "message": str(e)})
+
+    def poll_events(self):
+        """Разбирает события из фонового потока; вызывается циклом Tk."""
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            self.handle_event(event)
+
+        if self.parser:
+            self.show_status(self.parser.stats)
+        if self.worker and self.worker.is_alive() or not self.events.empty():
+            self.root.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def handle_event(self, event):
+        if event["type"] == "thread":
+            thread = event["data"]
+            self.result_text.insert(tk.END, f"{thread['title']} - {thread['author']}\n")
+            self.result_text.see(tk.END)
+        elif event["type"] == "page":
+            self.update_progress(event["stats"]["pages_done"], event["stats"]["total_pages"])
+        elif event["type"] == "finished":
+            self.finish_parsing()
+            if event["session_error"]:
+                self.relogin_and_resume(event["session_error"], event["count"])
+            elif event["cancelled"]:
+                messagebox.showinfo("Отмена", f"Парсинг отменен. Обработано {event['count']} тем.")
+            elif event["count"]:
+                messagebox.showinfo("Успех", f"Найдено {event['count']} тем.")
+            else:
+                messagebox.showwarning("Ошибка", "Темы не найдены.")
+        elif event["type"] == "error":
+            self.finish_parsing()
+            messagebox.showerror("Ошибка", event["message"])
+
+    def relogin_and_resume(self, message, count):
+        """Сессия истекла посреди обхода, а войти заново нечем: запрашивает вход и продолжает обход."""
+        messagebox.showwarning("Сессия истекла",
+                               f"{message}\nОбработано {count} тем. Войдите заново, чтобы продолжить обход.")
+        username = simpledialog.askstring("Вход", "Логин:", parent=self.root)
+        password = username and simpledialog.askstring("Вход", "Пароль:", show="*", parent=self.root)
+        if not password:
+            return
+
+        self.session.cookies.clear()
+        try:
+            auth.login(self.session, username, password)
+        except Exception as e:
+            logging.exception("Ошибка входа")
+            messagebox.showerror("Ошибка", str(e))
+            return
+        # Обход продолжается с сохраненной страницы, обработанные темы пропускаются
+        self.parse_forum()
+
+    def show_status(self, stats):
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        megabytes = stats["bytes_downloaded"] / (1024 * 1024)
+        self.status_label.config(
+            text=f"Страниц: {stats['pages_done']}/{stats['total_pages']}   Тем: {stats['threads_done']}   "
+                 f"Скачано: {megabytes:.1f} МБ   Скорость: {megabytes / elapsed:.2f} МБ/с   "
+                 f"Файлов в очереди: {stats['files_queued']}"
+                 + ("   (пауза)" if self.parser.paused else ""))
+
+    def toggle_pause(self):
+        if not self.parser:
+            return
+        if self.parser.paused:
+            self.parser.resume()
+            self.pause_button.config(text="Пауза")
         else:
-            messagebox.showwarning("Ошибка", "Темы не найдены.")
+            self.parser.pause()
+            self.pause_button.config(text="Продолжить")
+
+    def cancel_parsing(self):
+        if self.parser:
+            self.parser.cancel()
+            self.cancel_button.config(state=tk.DISABLED)
+            self.pause_button.config(state=tk.DISABLED)
+
+    def finish_parsing(self):
+        self.parse_button.config(state=tk.NORMAL)
+        self.pause_button.config(state=tk.DISABLED, text="Пауза")
+        self.cancel_button.config(state=tk.DISABLED)
@@ -0,0 +1,61 @@
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from forum_server import ForumConfig, start_server  # noqa: E402
+from crawl_db import CrawlDatabase, CRAWL_DB_FILE_NAME  # noqa: E402
+from http_session import create_session  # noqa: E402
+from parser import Parser  # noqa: E402
+
+
+@pytest.fixture
+def forum():
+    """Запускает сервер-заглушку форума; forum(**config) возвращает (состояние, базовый URL)."""
+    servers = []
+
+    def start(**config):
+        server, state, base_url = start_server(ForumConfig(**config))
+        servers.append(server)
+        return state, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_parser(base_url, save_path, section=1, **options):
+    options.setdefault("use_cache", False)
+    return Parser(create_session(rate=0), f"{base_url}/forums/bench.{section}/", save_path=save_path,
+                  base_url=base_url, **options)
+
+
+def crawl(parser, limit=None):
+    """Обходит форум без вывода в консоль; limit — закрыть обход после стольких тем. Возвращает темы."""
+    threads = []
+    generator = parser.parse_forum()
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            for data in generator:
+                threads.append(data)
+                if limit and len(threads) >= limit:
+                    break
+        finally:
+            generator.close()  # Досрочно закрытый обход отменяется и сохраняет контрольную точку
+    return threads
+
+
+def report_rows(save_path):
+    """Строки отчета из базы состояния обхода: (статус, тема, ссылка на тему, ссылка на файл, имя файла)."""
+    database = CrawlDatabase(os.path.join(save_path, CRAWL_DB_FILE_NAME))
+    try:
+        return list(database.iter_attachments())
+    finally:
+        database.close()
@@ -0,0 +1,35 @@
+import threading
+import time
+
+import pytest
+
+import auth
+
+
+def test_concurrent_expired_requests_log_in_once(monkeypatch):
+    logins = []
+
+    def fake_login(session, username, password, cookie_path=None):
+        logins.append(username)
+        time.sleep(0.05)
+
+    monkeypatch.setattr(auth, "login", fake_login)
+    keeper = auth.SessionKeeper("user", "secret", cookie_path=None)
+    session = type("Session", (), {"cookies": set()})()
+
+    threads = [threading.Thread(target=keeper.reauthenticate, args=(session, 0)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert logins == ["user"]
+    assert keeper.generation == 1
+
+
+def test_keeper_without_password_reports_expired_session():
+    keeper = auth.SessionKeeper(cookie_path=None)
+    session = type("Session", (), {"cookies": set()})()
+
+    with pytest.raises(auth.SessionExpired):
+        keeper.reauthenticate(session, 0)
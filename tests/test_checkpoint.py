@@ -0,0 +1,30 @@
+from conftest import crawl, make_parser, report_rows
+
+
+def test_interrupted_crawl_resumes_without_repeating_threads(forum, tmp_path):
+    state, base_url = forum(threads=45, thread_pages=1)
+
+    first = crawl(make_parser(base_url, str(tmp_path), workers=1), limit=25)
+    second = crawl(make_parser(base_url, str(tmp_path), workers=1))
+
+    urls = [data["thread_url"] for data in first + second]
+    assert len(urls) == len(set(urls)) == 45
+
+
+def test_thread_with_new_reply_is_parsed_again(forum, tmp_path):
+    state, base_url = forum(threads=30, thread_pages=2)
+    crawl(make_parser(base_url, str(tmp_path), workers=2))
+    assert crawl(make_parser(base_url, str(tmp_path), workers=2, incremental=True)) == []
+
+    # Ответ в теме с первой страницы списка находит и инкрементальный обход
+    state.add_reply(5)
+    threads = crawl(make_parser(base_url, str(tmp_path), workers=2, incremental=True))
+    assert [data["thread_url"] for data in threads] == [f"{base_url}/threads/thread-5.5"]
+
+    # Полный обход находит ответы и на дальних страницах списка
+    state.add_reply(25)
+    threads = crawl(make_parser(base_url, str(tmp_path), workers=2))
+    assert [data["thread_url"] for data in threads] == [f"{base_url}/threads/thread-25.25"]
+
+    file_urls = {row[3] for row in report_rows(str(tmp_path))}
+    assert {"/attachments/reply-5-1.5/", "/attachments/reply-25-1.25/"} <= file_urls
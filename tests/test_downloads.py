@@ -0,0 +1,59 @@
+import hashlib
+import time
+
+from conftest import crawl, make_parser, report_rows
+from report import STATUS_DONE
+
+
+def test_partial_download_is_resumed_with_range(forum, tmp_path):
+    state, base_url = forum(threads=1, attachment_size=100_000)
+    parser = make_parser(base_url, str(tmp_path))
+    file_url = f"{base_url}/attachments/own-0-1.0/"
+    body = state.attachment("own-0-1")
+    with open(parser.store.part_path(file_url), "wb") as f:
+        f.write(body[:40_000])
+
+    try:
+        entry = parser.download_file(file_url, str(tmp_path))
+    finally:
+        parser.close()
+
+    assert entry["sha256"] == hashlib.sha256(body).hexdigest()
+    assert parser.stats["bytes_downloaded"] == len(body) - 40_000
+
+
+def test_download_queue_stays_within_its_window(forum, tmp_path):
+    state, base_url = forum(threads=10, attachment_size=10_000, hub_every=0)
+    parser = make_parser(base_url, str(tmp_path), download_workers=1)
+    parser.downloads.max_pending = 3
+    download_queued = parser.download_queued
+    pending = []
+
+    def slow_download(attachment, thread_folder):
+        pending.append(parser.downloads.pending)
+        time.sleep(0.01)
+        download_queued(attachment, thread_folder)
+
+    parser.download_queued = slow_download
+    crawl(parser)
+
+    assert pending and max(pending) <= 3
+    assert {row[0] for row in report_rows(str(tmp_path))} == {STATUS_DONE}
+
+
+def test_complete_part_is_finalized_without_downloading(forum, tmp_path):
+    state, base_url = forum(threads=1, attachment_size=50_000)
+    parser = make_parser(base_url, str(tmp_path))
+    file_url = f"{base_url}/attachments/own-0-1.0/"
+    body = state.attachment("own-0-1")
+    with open(parser.store.part_path(file_url), "wb") as f:
+        f.write(body)
+
+    try:
+        entry = parser.download_file(file_url, str(tmp_path))
+    finally:
+        parser.close()
+
+    assert entry["sha256"] == hashlib.sha256(body).hexdigest()
+    assert entry["size"] == len(body)
+    assert parser.stats["bytes_downloaded"] == 0
@@ -0,0 +1,33 @@
+import glob
+import os
+
+from http_cache import ResponseCache
+from http_session import create_session
+
+
+def test_not_modified_page_is_served_from_cache(forum, tmp_path):
+    state, base_url = forum(threads=5)
+    cache = ResponseCache(str(tmp_path))
+    session = create_session(rate=0)
+    url = f"{base_url}/forums/bench.1/"
+
+    first = cache.fetch(session, url)
+    second = cache.fetch(session, url)
+
+    assert second == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_not_modified_without_cached_body_refetches_page(forum, tmp_path):
+    state, base_url = forum(threads=5)
+    cache = ResponseCache(str(tmp_path))
+    session = create_session(rate=0)
+    url = f"{base_url}/forums/bench.1/"
+    page = cache.fetch(session, url)
+
+    # Тело записи пропало, а метаданные с ETag остались — сервер ответит 304 без тела
+    for body_path in glob.glob(os.path.join(str(tmp_path), "*.body")):
+        os.remove(body_path)
+
+    assert [cache.fetch(session, url) for _ in range(3)] == [page] * 3
+    assert cache.hits == 2  # После повторной загрузки запись снова в кэше
@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import crawl, make_parser, report_rows
+from report import STATUS_DONE, STATUS_FAILED, STATUS_SKIPPED
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_broken_attachment_does_not_drop_thread(forum, tmp_path, workers):
+    state, base_url = forum(threads=10, broken_every=4)
+
+    threads = crawl(make_parser(base_url, str(tmp_path), workers=workers))
+
+    assert len(threads) == 10
+    statuses = {row[3]: row[0] for row in report_rows(str(tmp_path))}
+    assert statuses["/attachments/missing-4.4/"] == STATUS_FAILED
+    assert statuses["/attachments/own-4-1.4/"] != STATUS_FAILED
+
+
+def test_thread_with_unloaded_page_is_retried_next_run(forum, tmp_path):
+    state, base_url = forum(threads=10, thread_pages=2)
+    state.fail("/threads/thread-3.3/page-2")
+
+    first = crawl(make_parser(base_url, str(tmp_path), workers=2))
+    assert f"{base_url}/threads/thread-3.3" not in [data["thread_url"] for data in first]
+
+    second = crawl(make_parser(base_url, str(tmp_path), workers=2, incremental=True))
+    assert [data["thread_url"] for data in second] == [f"{base_url}/threads/thread-3.3"]
+    assert len(second[0]["author"]) == 2 * state.config.posts_per_page
+    assert "/attachments/own-3-2.3/" in {row[3] for row in report_rows(str(tmp_path))}
+
+
+def test_thread_with_unloaded_download_page_is_retried_next_run(forum, tmp_path):
+    state, base_url = forum(threads=10, hub_every=20)
+    state.fail("/resources/hub.1/download", method="GET")
+
+    first = crawl(make_parser(base_url, str(tmp_path), workers=1))
+    assert len(first) == 9  # Тема 0 ссылается на страницу загрузок, которая не открылась
+
+    second = crawl(make_parser(base_url, str(tmp_path), workers=1, incremental=True))
+    assert [data["thread_url"] for data in second] == [f"{base_url}/threads/thread-0.0"]
+    file_urls = {row[3] for row in report_rows(str(tmp_path))}
+    assert {f"{base_url}/attachments/hub-0.0/", f"{base_url}/attachments/hub-1.0/"} <= file_urls
+
+
+def test_download_page_with_failed_probe_is_not_saved_as_file(forum, tmp_path):
+    state, base_url = forum(threads=10, hub_every=20)
+    state.fail("/resources/hub.1/download", method="HEAD")
+
+    threads = crawl(make_parser(base_url, str(tmp_path), workers=1))
+
+    assert len(threads) == 10
+    statuses = {row[3]: row[0] for row in report_rows(str(tmp_path))}
+    assert statuses["/resources/hub.1/download"] == STATUS_SKIPPED
+    assert statuses[f"{base_url}/attachments/hub-0.0/"] == STATUS_DONE
+    assert statuses[f"{base_url}/attachments/hub-1.0/"] == STATUS_DONE
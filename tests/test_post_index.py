@@ -0,0 +1,39 @@
+import os
+
+from conftest import make_parser
+from post_index import POST_INDEX_FILE_NAME, PostIndex, post_key
+
+THREAD_URL = "https://forum.example/threads/old-thread.7"
+
+
+def old_entry(author, text):
+    return f"Ссылка на тему: {THREAD_URL}\nНазвание: Старая тема\nАвтор: {author}\nОписание:\n{text}\n"
+
+
+def test_index_is_built_from_existing_text_file(forum, tmp_path):
+    state, base_url = forum(threads=1)
+    thread_folder = tmp_path / "Старая тема"
+    thread_folder.mkdir()
+    txt_path = thread_folder / "Старая тема.txt"
+    # Текстовый файл записан версией без индекса: сообщения двух запусков, разделенные пустыми строками
+    txt_path.write_text(old_entry("anna", "Первое сообщение\nв две строки") + "\n" * 5
+                        + old_entry("boris", "  Второе сообщение  ") + "\n" * 5, encoding="utf-8")
+
+    index = PostIndex(str(thread_folder), str(txt_path))
+    assert post_key(THREAD_URL, "anna", "Первое сообщение\nв две строки") in index
+    assert post_key(THREAD_URL, "boris", "Второе сообщение") in index
+    assert os.path.exists(thread_folder / POST_INDEX_FILE_NAME)
+
+    parser = make_parser(base_url, str(tmp_path))
+    try:
+        parser.save_text_file({"thread_url": THREAD_URL + "/", "title": "Старая тема", "dir_name": "Старая тема",
+                               "author": ["anna", "boris", "vera"],
+                               "br_text": ["Первое сообщение\nв две строки", "Второе сообщение", "Новое"]},
+                              str(thread_folder))
+    finally:
+        parser.close()
+
+    content = txt_path.read_text(encoding="utf-8")
+    assert content.count("Ссылка на тему: ") == 3
+    assert content.count("Первое сообщение") == 1
+    assert content.endswith(old_entry("vera", "Новое") + "\n" * 5)
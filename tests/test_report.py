@@ -0,0 +1,27 @@
+import os
+
+import openpyxl
+
+from crawl_db import CrawlDatabase
+from report import STATUS_DONE, merge_reports
+
+
+def test_merged_report_lists_shared_file_once(tmp_path):
+    db_paths = []
+    for section, files in ((1, ["/a/1", "/a/shared"]), (2, ["/a/shared", "/a/2"])):
+        db_path = os.path.join(str(tmp_path), f"section{section}.db")
+        database = CrawlDatabase(db_path, f"http://forum/forums/{section}/")
+        for file_url in files:
+            database.add_attachment(STATUS_DONE, f"Тема {section}", f"http://forum/threads/{section}", file_url,
+                                    file_url.rsplit("/", 1)[1])
+        database.close()
+        db_paths.append(db_path)
+
+    excel_path = os.path.join(str(tmp_path), "report.xlsx")
+    assert merge_reports(db_paths, excel_path) == 3
+
+    workbook = openpyxl.load_workbook(excel_path, read_only=True)
+    rows = list(workbook.worksheets[0].iter_rows(min_row=2, values_only=True))
+    workbook.close()
+    assert [row[4] for row in rows] == ["/a/1", "/a/shared", "/a/2"]
+    assert rows[1][3] == "http://forum/threads/1"